@@ -0,0 +1,68 @@
+import numpy as np
+from typing import Callable
+
+# Signature of the callbacks accepted by the solvers: called after every sweep with
+# the largest value change (delta), the number of state updates and the duration of the sweep in seconds
+SweepCallback = Callable[[float, int, float], None]
+
+
+class ConvergenceTrace:
+    """
+    Records the progress of an iterative solver, pass it as `callback` to e.g. `evaluatePolicy`.
+    After the solver has finished, `deltas`, `updates` and `seconds` contain one entry per sweep.
+    """
+    def __init__(self):
+        self.deltas: list[float] = []
+        self.updates: list[int] = []
+        self.seconds: list[float] = []
+
+    def __call__(self, delta: float, nUpdates: int, seconds: float):
+        self.deltas.append(float(delta))
+        self.updates.append(int(nUpdates))
+        self.seconds.append(float(seconds))
+
+    @property
+    def sweeps(self) -> int:
+        return len(self.deltas)
+
+    @property
+    def totalSeconds(self) -> float:
+        return float(sum(self.seconds))
+
+    @property
+    def updatesPerSecond(self) -> np.ndarray:
+        """
+        Number of state updates per second of each sweep.
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.array(self.updates, dtype=float) / np.array(self.seconds)
+
+    def toArray(self) -> np.ndarray:
+        """
+        The trace as a structured array with fields `sweep`, `delta`, `updates`, `seconds` and `updatesPerSecond`,
+        e.g. for plotting `trace['delta']` on a log scale or saving the trace with `np.save`.
+        """
+        trace = np.zeros(self.sweeps, dtype=[
+            ('sweep', np.int64),
+            ('delta', float),
+            ('updates', np.int64),
+            ('seconds', float),
+            ('updatesPerSecond', float),
+        ])
+        trace['sweep'] = np.arange(1, self.sweeps + 1)
+        trace['delta'] = self.deltas
+        trace['updates'] = self.updates
+        trace['seconds'] = self.seconds
+        trace['updatesPerSecond'] = self.updatesPerSecond
+        return trace
+
+    def __repr__(self) -> str:
+        if self.sweeps == 0:
+            return 'ConvergenceTrace(no sweeps)'
+        totalUpdates = sum(self.updates)
+        return 'ConvergenceTrace({} sweeps, final delta {:.3g}, {:.3g} s, {:.3g} updates/s)'.format(
+            self.sweeps,
+            self.deltas[-1],
+            self.totalSeconds,
+            totalUpdates / self.totalSeconds if self.totalSeconds > 0 else float('nan'),
+        )
@@ -0,0 +1,271 @@
+import time
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+from typing import NamedTuple, Optional
+
+from convergenceTrace import SweepCallback
+
+
+class SolverStats(NamedTuple):
+    """
+    Work done by `GamblersProblem.modifiedPolicyIteration`: number of improvement rounds and
+    evaluation sweeps, and the time (in seconds) spent in evaluation and improvement.
+    """
+    rounds: int
+    sweeps: int
+    evaluationSeconds: float
+    improvementSeconds: float
+
+    @property
+    def totalSeconds(self) -> float:
+        return self.evaluationSeconds + self.improvementSeconds
+
+
+class GamblersProblem:
+    """
+    The Gambler's problem (Example 4.3 in Sutton & Barto), see `Gambler's_Problem_solution.ipynb`.
+    States are the capital `0, ..., maxMoney`, a (deterministic) policy is an integer array with the stake
+    for each state (0 in the terminal states). All methods work on whole arrays of states at once:
+    action values are computed one stake at a time for all states where that stake is allowed,
+    so memory stays linear in `maxMoney`.
+    """
+    def __init__(self, pHeads: float = 0.4, maxMoney: int = 100, gamma: float = 1, theta: float = 1e-15):
+        self.pHeads = pHeads
+        self.maxMoney = maxMoney
+        self.gamma = gamma
+        self.theta = theta
+
+    @property
+    def states(self) -> np.ndarray:
+        return np.arange(self.maxMoney + 1)
+
+    def evalAction(self, state: int, action: int, currentValues: np.ndarray) -> float:
+        """
+        Expected reward + discounted value of the next state for a single state and action (as in the notebook).
+        """
+        if state == 0 or state == self.maxMoney:
+            return 0
+        if state + action > self.maxMoney or state - action < 0:
+            raise ValueError("Invalid action")
+        expectedValue = self.pHeads * currentValues[state + action] + (1 - self.pHeads) * currentValues[state - action]
+        expectedReward = self.pHeads if state + action == self.maxMoney else 0
+        return expectedReward + self.gamma * expectedValue
+
+    def _stakeValues(self, winValues: np.ndarray, loseValues: np.ndarray, stake: int, out: np.ndarray) -> np.ndarray:
+        # Values of staking `stake` in the states `stake, ..., maxMoney - stake` (the states where this
+        # stake is allowed), written to the start of `out`. `winValues`/`loseValues` are the values
+        # multiplied with the probabilities of heads/tails (computed once for all stakes).
+        actionValues = out[:self.maxMoney + 1 - 2 * stake]
+        np.add(winValues[2 * stake:], loseValues[:len(actionValues)], out=actionValues)
+        if self.gamma != 1:
+            actionValues *= self.gamma
+        # Only the last of these states reaches the goal with a win
+        actionValues[-1] += self.pHeads
+        return actionValues
+
+    def backup(self, values: np.ndarray, policy: np.ndarray) -> np.ndarray:
+        """
+        One (synchronous) Bellman backup of `values` for `policy`, terminal states keep the value 0.
+        """
+        states = self.states
+        # Ignore the stakes in the terminal states
+        stakes = np.where((states > 0) & (states < self.maxMoney), policy, 0)
+        newValues = self.gamma * (
+            self.pHeads * values[states + stakes] + (1 - self.pHeads) * values[states - stakes]
+        )
+        newValues += np.where((stakes > 0) & (states + stakes == self.maxMoney), self.pHeads, 0)
+        newValues[0] = newValues[-1] = 0
+        return newValues
+
+    def policyEvaluation(
+            self,
+            policy: np.ndarray,
+            values: Optional[np.ndarray] = None,
+            callback: Optional[SweepCallback] = None,
+            maxSweeps: Optional[int] = None,
+        ) -> np.ndarray:
+        """
+        Iterative policy evaluation (starting from `values` or zeros) until the largest change is below `theta`,
+        or after `maxSweeps` sweeps. `callback` (e.g. a `ConvergenceTrace`) is called after every sweep.
+        """
+        values = np.zeros(self.maxMoney + 1) if values is None else np.array(values, dtype=float)
+        sweeps = 0
+        while maxSweeps is None or sweeps < maxSweeps:
+            if callback is not None:
+                sweepStart = time.perf_counter()
+            newValues = self.backup(values, policy)
+            delta = np.max(np.abs(newValues - values))
+            values = newValues
+            sweeps += 1
+            if callback is not None:
+                callback(delta, len(values), time.perf_counter() - sweepStart)
+            if delta < self.theta:
+                break
+        return values
+
+    def policyEvaluationExact(self, policy: np.ndarray) -> np.ndarray:
+        """
+        Values of `policy` from solving the (sparse) linear system (I - gamma * P) v = r directly.
+        States with stake 0 keep the value 0 (as in iterative evaluation starting from zeros).
+        """
+        states = self.states
+        policy = np.asarray(policy)
+        active = (policy > 0) & (states > 0) & (states < self.maxMoney)
+        activeStates = states[active]
+        stakes = policy[active]
+        nStates = len(states)
+
+        # Each active state moves to `s + stake` or `s - stake`, the goal and 0 are terminal (value 0)
+        rows = np.concatenate([activeStates, activeStates])
+        cols = np.concatenate([activeStates + stakes, activeStates - stakes])
+        probs = np.concatenate([np.full(len(activeStates), self.pHeads), np.full(len(activeStates), 1 - self.pHeads)])
+        nonTerminal = (cols > 0) & (cols < self.maxMoney)
+        transitions = scipy.sparse.csr_matrix(
+            (probs[nonTerminal], (rows[nonTerminal], cols[nonTerminal])), shape=(nStates, nStates)
+        )
+        rewards = np.where(active & (states + policy == self.maxMoney), self.pHeads, 0.0)
+        system = scipy.sparse.identity(nStates, format='csr') - self.gamma * transitions
+        return scipy.sparse.linalg.spsolve(system.tocsc(), rewards)
+
+    def policyImprovement(self, values: np.ndarray) -> np.ndarray:
+        """
+        Greedy policy for `values`. As in the notebook, stakes are considered from low to high and a stake
+        only replaces the current best one if its value is higher by more than `2*theta` (avoids noisy updates).
+        """
+        winValues = self.pHeads * values
+        loseValues = (1 - self.pHeads) * values
+        bestValues = np.zeros(self.maxMoney + 1)
+        policy = np.zeros(self.maxMoney + 1, dtype=np.int64)
+
+        # Buffers reused for all stakes
+        actionValuesBuffer = np.empty(self.maxMoney + 1)
+        betterBuffer = np.empty(self.maxMoney + 1, dtype=bool)
+        for stake in range(1, self.maxMoney // 2 + 1):
+            actionValues = self._stakeValues(winValues, loseValues, stake, actionValuesBuffer)
+            stakeStates = slice(stake, stake + len(actionValues))
+            better = betterBuffer[:len(actionValues)]
+            np.greater(actionValues - bestValues[stakeStates], 2 * self.theta, out=better)
+            np.copyto(bestValues[stakeStates], actionValues, where=better)
+            np.copyto(policy[stakeStates], stake, where=better)
+        return policy
+
+    def bestActionValues(self, values: np.ndarray) -> np.ndarray:
+        """
+        The value of the best stake in each state (0 in the terminal states).
+        """
+        winValues = self.pHeads * values
+        loseValues = (1 - self.pHeads) * values
+        bestValues = np.zeros(self.maxMoney + 1)
+        actionValuesBuffer = np.empty(self.maxMoney + 1)
+        for stake in range(1, self.maxMoney // 2 + 1):
+            actionValues = self._stakeValues(winValues, loseValues, stake, actionValuesBuffer)
+            stakeStates = slice(stake, stake + len(actionValues))
+            np.maximum(bestValues[stakeStates], actionValues, out=bestValues[stakeStates])
+        return bestValues
+
+    def valueIteration(
+            self,
+            values: Optional[np.ndarray] = None,
+            callback: Optional[SweepCallback] = None,
+        ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Value iteration with synchronous sweeps until the largest change is below `theta`.
+        Returns the values and the greedy policy (with the tie-breaking of `policyImprovement`).
+        """
+        values = np.zeros(self.maxMoney + 1) if values is None else np.array(values, dtype=float)
+        while True:
+            if callback is not None:
+                sweepStart = time.perf_counter()
+            newValues = self.bestActionValues(values)
+            delta = np.max(np.abs(newValues - values))
+            values = newValues
+            if callback is not None:
+                callback(delta, len(values), time.perf_counter() - sweepStart)
+            if delta < self.theta:
+                break
+        return values, self.policyImprovement(values)
+
+    def policyIteration(
+            self,
+            policy: Optional[np.ndarray] = None,
+            exact: bool = True,
+        ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Policy iteration starting from `policy` (default: always stake 1) until the policy does not change.
+        With `exact=True` each policy is evaluated with `policyEvaluationExact`, else iteratively.
+        """
+        if policy is None:
+            policy = np.ones(self.maxMoney + 1, dtype=np.int64)
+            policy[0] = policy[-1] = 0
+        while True:
+            values = self.policyEvaluationExact(policy) if exact else self.policyEvaluation(policy)
+            newPolicy = self.policyImprovement(values)
+            if np.array_equal(newPolicy, policy):
+                break
+            policy = newPolicy
+        return values, policy
+
+    def modifiedPolicyIteration(
+            self,
+            evaluationSweeps: int = 32,
+            stableRounds: int = 1,
+            values: Optional[np.ndarray] = None,
+            maxRounds: Optional[int] = None,
+            callback: Optional[SweepCallback] = None,
+        ) -> tuple[np.ndarray, np.ndarray, SolverStats]:
+        """
+        Modified policy iteration: alternate a greedy improvement with at most `evaluationSweeps` sweeps of
+        policy evaluation (`evaluationSweeps=1` is value iteration). Once the greedy policy has not changed
+        for `stableRounds` rounds (or the values have converged), the policy is evaluated exactly and only accepted
+        if it is greedy for these values (as in `policyIteration`), otherwise the iteration continues from them.
+        Stops early after `maxRounds` rounds. Returns the exact values of the policy, the policy and
+        a `SolverStats` with timings.
+        """
+        values = np.zeros(self.maxMoney + 1) if values is None else np.array(values, dtype=float)
+        policy = None
+        unchangedRounds = 0
+        exact = converged = False
+        rounds = sweeps = 0
+        evaluationSeconds = improvementSeconds = 0.0
+
+        def countSweeps(delta: float, nUpdates: int, seconds: float):
+            # Evaluation can stop before `evaluationSweeps` sweeps, count the sweeps that were actually done
+            nonlocal sweeps
+            sweeps += 1
+            if callback is not None:
+                callback(delta, nUpdates, seconds)
+
+        while maxRounds is None or rounds < maxRounds:
+            start = time.perf_counter()
+            newPolicy = self.policyImprovement(values)
+            improvementSeconds += time.perf_counter() - start
+            rounds += 1
+
+            if policy is not None and np.array_equal(newPolicy, policy):
+                if exact:
+                    # The policy is greedy for its own values, i.e. optimal
+                    break
+                unchangedRounds += 1
+            else:
+                unchangedRounds = 0
+            policy = newPolicy
+
+            start = time.perf_counter()
+            exact = converged or unchangedRounds >= stableRounds
+            if exact:
+                values = self.policyEvaluationExact(policy)
+                unchangedRounds = 0
+                converged = False
+            else:
+                newValues = self.policyEvaluation(policy, values, callback=countSweeps, maxSweeps=evaluationSweeps)
+                converged = np.max(np.abs(newValues - values)) < self.theta
+                values = newValues
+            evaluationSeconds += time.perf_counter() - start
+
+        if not exact:
+            # Stopped by `maxRounds`
+            start = time.perf_counter()
+            values = self.policyEvaluationExact(policy)
+            evaluationSeconds += time.perf_counter() - start
+        return values, policy, SolverStats(rounds, sweeps, evaluationSeconds, improvementSeconds)
@@ -0,0 +1,159 @@
+import glob
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterable, Iterator, Optional
+
+from gamblersProblem import GamblersProblem
+
+# A configuration of the Gambler's problem: (pHeads, maxMoney, gamma)
+Configuration = tuple[float, int, float]
+
+# Solvers (methods of `GamblersProblem`) that can be used for a sweep
+POLICY_ITERATION = 'policyIteration'
+MODIFIED_POLICY_ITERATION = 'modifiedPolicyIteration'
+
+
+def _configurationKey(configuration) -> Configuration:
+    pHeads, maxMoney, gamma = configuration
+    return float(pHeads), int(maxMoney), float(gamma)
+
+
+def _solveConfiguration(configuration: Configuration, theta: float, method: str, solverOptions: dict):
+    # Solve one configuration (in a worker process)
+    pHeads, maxMoney, gamma = configuration
+    start = time.perf_counter()
+    problem = GamblersProblem(pHeads, maxMoney, gamma, theta)
+    values, policy = getattr(problem, method)(**solverOptions)[:2]
+    return configuration, values, policy, time.perf_counter() - start
+
+
+def _chunkPaths(storeDir: str) -> list[str]:
+    # (Not matching the temporary files of unfinished writes)
+    return sorted(glob.glob(os.path.join(storeDir, 'chunk_' + '[0-9]' * 6 + '.npz')))
+
+
+def _writeChunk(storeDir: str, index: int, results: list):
+    # All results of a chunk in one file: the values/policies of all configurations are concatenated,
+    # `offsets` marks where each configuration starts. Written atomically, so a crash never leaves a broken chunk.
+    configurations = np.array([result[0] for result in results], dtype=float).reshape(-1, 3)
+    lengths = [len(result[1]) for result in results]
+    data = dict(
+        configurations=configurations,
+        offsets=np.concatenate([[0], np.cumsum(lengths)]),
+        values=np.concatenate([result[1] for result in results]),
+        policies=np.concatenate([result[2] for result in results]),
+        seconds=np.array([result[3] for result in results]),
+    )
+    path = os.path.join(storeDir, 'chunk_{:06d}.npz'.format(index))
+    tmpPath = '{}.{}.tmp.npz'.format(path[:-4], os.getpid())
+    np.savez_compressed(tmpPath, **data)
+    os.replace(tmpPath, path)
+
+
+def loadResults(storeDir: str) -> Iterator[tuple[Configuration, np.ndarray, np.ndarray, float]]:
+    """
+    Iterate over all results in a store written by `sweepConfigurations`:
+    yields `(configuration, values, policy, seconds)` for every solved configuration.
+    """
+    for path in _chunkPaths(storeDir):
+        with np.load(path) as data:
+            offsets = data['offsets']
+            for i, configuration in enumerate(data['configurations']):
+                part = slice(offsets[i], offsets[i + 1])
+                yield (
+                    _configurationKey(configuration),
+                    data['values'][part],
+                    data['policies'][part],
+                    float(data['seconds'][i]),
+                )
+
+
+def solvedConfigurations(storeDir: str) -> set[Configuration]:
+    """
+    The configurations that are already stored in `storeDir`.
+    """
+    solved = set()
+    for path in _chunkPaths(storeDir):
+        with np.load(path) as data:
+            solved.update(_configurationKey(configuration) for configuration in data['configurations'])
+    return solved
+
+
+def sweepConfigurations(
+        configurations: Iterable[Configuration],
+        storeDir: str,
+        theta: float = 1e-15,
+        nWorkers: Optional[int] = None,
+        chunkSize: int = 100,
+        flushSeconds: float = 60,
+        method: str = POLICY_ITERATION,
+        verbose: bool = False,
+        **solverOptions,
+    ) -> int:
+    """
+    Solve the Gambler's problem for all `configurations` (tuples `(pHeads, maxMoney, gamma)`)
+    with `nWorkers` processes (default: all cores), using `GamblersProblem.policyIteration`
+    or `GamblersProblem.modifiedPolicyIteration` (`method=MODIFIED_POLICY_ITERATION`),
+    `solverOptions` are passed on (e.g. `exact` or `evaluationSweeps`).
+    Results are written to `storeDir` in chunks of up to `chunkSize` configurations, at the latest
+    `flushSeconds` after the last write and when the sweep stops (also if it is interrupted).
+    Configurations that are already in the store are skipped, so an interrupted sweep can simply be restarted.
+    Configurations whose solver raises an error are reported and left out (they are retried on a restart).
+    Returns the number of configurations that were solved.
+    """
+    if method not in (POLICY_ITERATION, MODIFIED_POLICY_ITERATION):
+        raise ValueError('Unknown method: {}'.format(method))
+    os.makedirs(storeDir, exist_ok=True)
+    solved = solvedConfigurations(storeDir)
+    pending = []
+    for configuration in map(_configurationKey, configurations):
+        if configuration not in solved:
+            solved.add(configuration)
+            pending.append(configuration)
+    if verbose:
+        print('{} configurations to solve'.format(len(pending)))
+
+    # Continue the chunk numbering of earlier runs
+    chunkPaths = _chunkPaths(storeDir)
+    nextChunk = int(os.path.basename(chunkPaths[-1])[6:12]) + 1 if chunkPaths else 0
+
+    # Solve the large problems first, so that the workers are busy until the end
+    pending.sort(key=lambda configuration: -configuration[1])
+
+    results = []
+    nFailed = 0
+    lastWrite = time.perf_counter()
+
+    def writeResults():
+        nonlocal results, nextChunk, lastWrite
+        _writeChunk(storeDir, nextChunk, results)
+        nextChunk += 1
+        results = []
+        lastWrite = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=nWorkers) as executor:
+        futures = {
+            executor.submit(_solveConfiguration, configuration, theta, method, solverOptions): configuration
+            for configuration in pending
+        }
+        try:
+            for nDone, future in enumerate(as_completed(futures), start=1):
+                try:
+                    results.append(future.result())
+                except Exception as error:
+                    nFailed += 1
+                    print('Solving {} failed: {!r}'.format(futures[future], error))
+                    continue
+                if len(results) >= chunkSize or time.perf_counter() - lastWrite >= flushSeconds:
+                    writeResults()
+                    if verbose:
+                        print('{}/{} configurations done'.format(nDone, len(futures)))
+        finally:
+            # Keep what has been solved so far, also if the sweep is interrupted (then skip the remaining ones)
+            if results:
+                writeResults()
+            for future in futures:
+                future.cancel()
+    return len(pending) - nFailed
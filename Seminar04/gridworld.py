@@ -2,19 +2,204 @@
 import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
-from typing import Optional, Sequence, Union, Iterable
+import scipy.sparse
+from typing import Optional, Sequence, Union, Iterable, Callable
 
 numeric = Union[int, float]
 Pos = tuple[int, int]
 
+ChangeCallback = Callable[[Iterable[Pos]], None]
+
+class BlockedSquares(list):
+    """
+    A list of positions that keeps track of its entries in a dict,
+    so `pos in blockedSquares` takes constant time instead of scanning the list.
+    `onChange` (if given) is called with the positions that became blocked or unblocked.
+    """
+    __slots__ = ('_counts', '_onChange')
+
+    def __init__(self, squares: Iterable[Pos] = (), onChange: Optional[ChangeCallback] = None):
+        super().__init__(squares)
+        self._onChange = onChange
+        self._counts: dict[Pos, int] = dict()
+        for pos in self:
+            self._counts[pos] = self._counts.get(pos, 0) + 1
+
+    def __contains__(self, pos) -> bool:
+        return pos in self._counts
+
+    def __reduce__(self):
+        return (self.__class__, (list(self), self._onChange))
+
+    def _notify(self, positions: Iterable[Pos]):
+        if self._onChange is not None and positions:
+            self._onChange(positions)
+
+    def _rebuild(self):
+        # Number of occurrences of each position (the list may contain duplicates)
+        oldPositions = set(self._counts)
+        self._counts = dict()
+        for pos in self:
+            self._counts[pos] = self._counts.get(pos, 0) + 1
+        self._notify(oldPositions.symmetric_difference(self._counts))
+
+    def _add(self, pos):
+        self._counts[pos] = self._counts.get(pos, 0) + 1
+        if self._counts[pos] == 1:
+            self._notify([pos])
+
+    def _discard(self, pos):
+        if self._counts[pos] == 1:
+            del self._counts[pos]
+            self._notify([pos])
+        else:
+            self._counts[pos] -= 1
+
+    def append(self, pos: Pos):
+        super().append(pos)
+        self._add(pos)
+
+    def insert(self, index, pos: Pos):
+        super().insert(index, pos)
+        self._add(pos)
+
+    def extend(self, squares: Iterable[Pos]):
+        squares = list(squares)
+        super().extend(squares)
+        newPositions = []
+        for pos in squares:
+            self._counts[pos] = self._counts.get(pos, 0) + 1
+            if self._counts[pos] == 1:
+                newPositions.append(pos)
+        self._notify(newPositions)
+
+    def __iadd__(self, squares: Iterable[Pos]):
+        self.extend(squares)
+        return self
+
+    def remove(self, pos: Pos):
+        super().remove(pos)
+        self._discard(pos)
+
+    def pop(self, index=-1) -> Pos:
+        pos = super().pop(index)
+        self._discard(pos)
+        return pos
+
+    def clear(self):
+        super().clear()
+        oldPositions = list(self._counts)
+        self._counts.clear()
+        self._notify(oldPositions)
+
+    # Less common modifications simply recount all entries
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._rebuild()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._rebuild()
+
+    def __imul__(self, n):
+        super().__imul__(n)
+        self._rebuild()
+        return self
+
+
+class TrackedDict(dict):
+    """
+    A dict indexed by positions that calls `onChange` with the affected keys whenever it is modified
+    """
+    __slots__ = ('_onChange',)
+
+    def __init__(self, items=(), onChange: Optional[ChangeCallback] = None):
+        super().__init__(items)
+        self._onChange = onChange
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self), self._onChange))
+
+    def _notify(self, positions: Iterable[Pos]):
+        if self._onChange is not None and positions:
+            self._onChange(positions)
+
+    def __setitem__(self, pos: Pos, value):
+        super().__setitem__(pos, value)
+        self._notify([pos])
+
+    def __delitem__(self, pos: Pos):
+        super().__delitem__(pos)
+        self._notify([pos])
+
+    def pop(self, pos: Pos, *default):
+        changed = pos in self
+        value = super().pop(pos, *default)
+        if changed:
+            self._notify([pos])
+        return value
+
+    def popitem(self):
+        pos, value = super().popitem()
+        self._notify([pos])
+        return pos, value
+
+    def setdefault(self, pos: Pos, default=None):
+        if pos not in self:
+            self[pos] = default
+        return self[pos]
+
+    def update(self, *args, **kwargs):
+        items = dict(*args, **kwargs)
+        super().update(items)
+        self._notify(list(items))
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        positions = list(self)
+        super().clear()
+        self._notify(positions)
+
+
 class GridWorld:
     """
     A generic gridworld class that can be used for different examples
     """
+    # Fixed set of attributes (faster access, less memory per instance)
+    __slots__ = (
+        'width',
+        'height',
+        'pos',
+        'moves',
+        'moveLabels',
+        'positionLabels',
+        '_rewards',
+        '_teleportations',
+        '_blockedSquares',
+        '_blockedBitmap',
+        'invalidActionReward',
+        '_compiled',
+        '_compiledKey',
+        '_version',
+        '_changeLog',
+        '_logStart',
+    )
+
     def __init__(self, height: int = 5, width: int = 5):
         """
         Properties other than `height`, `width` have to be modified after initialization.
         """
+        # Changes to `rewards`, `teleportations` and `blockedSquares` are counted by `version`,
+        # the affected positions are logged so compiled dynamics can be updated incrementally
+        self._version = 0
+        self._changeLog: list[list[Pos]] = []
+        self._logStart = 0
+        self._compiled: dict[bool, Union[CompiledGridWorld, SparseCompiledGridWorld]] = dict()
+        self._compiledKey: dict[bool, tuple] = dict()
+
         # The width and height of the world
         self.width = width
         self.height = height
@@ -35,6 +220,7 @@ class GridWorld:
         self.positionLabels: dict[Pos, str] = dict()
         
         # Rewards for landing in particular positions (0 else)
+        # (this and the next two properties are tracked, see `version`)
         self.rewards: dict[Pos, numeric] = dict()
         
         # Positions that teleport somewhere else in the format
@@ -42,11 +228,83 @@ class GridWorld:
         self.teleportations: dict[Pos, tuple[Pos, numeric]] = dict()
 
         # Positions that cannot be moved onto
+        # (stored as `BlockedSquares`, which behaves like a list)
+        # Worlds loaded from a file keep a bitmap instead until the list is accessed
+        self._blockedBitmap: Optional[np.ndarray] = None
         self.blockedSquares: list[Pos] = []
         
         # Reward/penalty for attempting an invalid move
         self.invalidActionReward: numeric = 0
 
+    @property
+    def rewards(self) -> TrackedDict:
+        return self._rewards
+
+    @rewards.setter
+    def rewards(self, rewards: dict[Pos, numeric]):
+        self._rewards = TrackedDict(rewards, self._logChanges)
+        self._logChanges(None)
+
+    @property
+    def teleportations(self) -> TrackedDict:
+        return self._teleportations
+
+    @teleportations.setter
+    def teleportations(self, teleportations: dict[Pos, tuple[Pos, numeric]]):
+        self._teleportations = TrackedDict(teleportations, self._logChanges)
+        self._logChanges(None)
+
+    @property
+    def blockedSquares(self) -> BlockedSquares:
+        if self._blockedSquares is None:
+            # Create the list from the bitmap on first use
+            rows, cols = np.divmod(np.flatnonzero(self._blockedBitmap), self.width)
+            self._blockedSquares = BlockedSquares(zip(rows.tolist(), cols.tolist()), self._logChanges)
+            self._blockedBitmap = None
+        return self._blockedSquares
+
+    @blockedSquares.setter
+    def blockedSquares(self, squares: Iterable[Pos]):
+        self._blockedSquares = BlockedSquares(squares, self._logChanges)
+        self._blockedBitmap = None
+        self._logChanges(None)
+
+    @property
+    def version(self) -> int:
+        """
+        Counter that is increased by every change to `rewards`, `teleportations` or `blockedSquares`
+        """
+        return self._version
+
+    def _logChanges(self, positions: Optional[Iterable[Pos]]):
+        """
+        "Private" helper function that records which positions changed (`None` means everything).
+        The log is only kept while there are compiled dynamics that can be updated with it.
+        """
+        self._version += 1
+        if positions is None or not self._compiled or len(self._changeLog) >= self.height * self.width:
+            self._changeLog = []
+            self._logStart = self._version
+        else:
+            self._changeLog.append(list(positions))
+
+    def changedStates(self, sinceVersion: int) -> Optional[np.ndarray]:
+        """
+        Indices (as in `compile()`) of all states whose transitions may have changed since `sinceVersion`,
+        i.e. the changed positions and every square that can move onto them.
+        Returns `None` if this is not known (then everything has to be assumed changed).
+        """
+        if sinceVersion < self._logStart:
+            return None
+        positions = [pos for changes in self._changeLog[sinceVersion - self._logStart:] for pos in changes]
+        if len(positions) == 0:
+            return np.zeros(0, dtype=int)
+        positions = np.array(positions, dtype=int).reshape(-1, 1, 2)
+        moves = np.array([(0, 0)] + list(self.moves), dtype=int).reshape(1, -1, 2)
+        sources = (positions - moves).reshape(-1, 2)
+        inside = (sources[:, 0] >= 0) & (sources[:, 0] < self.height) & (sources[:, 1] >= 0) & (sources[:, 1] < self.width)
+        return np.unique(sources[inside, 0] * self.width + sources[inside, 1])
+
     def step(self, action: int, pos0: Optional[Pos] = None) -> tuple[Pos, numeric]:
         """
         Actually make a step.
@@ -97,13 +355,12 @@ class GridWorld:
         """
         "Private" helper function that checks if a position is inside the world and not blocked
         """
-        return not (
-            pos[0] < 0
-            or pos[1] < 0
-            or pos[0] >= self.height
-            or pos[1] >= self.width
-            or pos in self.blockedSquares
-        )
+        if not self._isInside(pos):
+            return False
+        if self._blockedSquares is None:
+            # Worlds loaded from a file: look the position up in the bitmap instead of creating the list
+            return not self._blockedBitmap[pos[0] * self.width + pos[1]]
+        return pos not in self._blockedSquares
         
     def allStates(self):
         """
@@ -111,6 +368,248 @@ class GridWorld:
         """
         return ((i, j) for i in range(self.height) for j in range(self.width))
 
+    def compile(self, sparse: bool = False) -> Union['CompiledGridWorld', 'SparseCompiledGridWorld']:
+        """
+        Build NumPy arrays `nextState[S, A]` and `reward[S, A]` describing the full dynamics.
+        States are numbered row by row (same order as `allStates()`), i.e. `s = row * width + col`.
+        With `sparse=True`, only the squares that are not blocked are numbered
+        and the transitions are stored as one sparse matrix per action instead.
+        The result is cached. After changes to `rewards`, `teleportations` or `blockedSquares`
+        only the affected rows of the dense arrays are recomputed (the sparse version is rebuilt).
+        """
+        key = self._structureKey()
+        compiled = self._compiled.get(sparse)
+        if compiled is not None and key == self._compiledKey[sparse] and compiled.version == self._version:
+            return compiled
+
+        changedStates = None
+        if compiled is not None and key == self._compiledKey[sparse] and not sparse:
+            changedStates = self.changedStates(compiled.version)
+        if changedStates is None:
+            compiled = self._buildSparseCompiled() if sparse else self._buildCompiled()
+        else:
+            self._updateCompiled(compiled, changedStates)
+        compiled.version = self._version
+        self._compiled[sparse] = compiled
+        self._compiledKey[sparse] = key
+        return compiled
+
+    def _structureKey(self) -> tuple:
+        """
+        "Private" helper function that summarizes the (untracked) properties the dynamics depend on
+        """
+        return (self.height, self.width, tuple(self.moves), self.invalidActionReward)
+
+    def _buildCompiled(self) -> 'CompiledGridWorld':
+        """
+        "Private" helper function that computes the transition arrays from scratch
+        """
+        height, width = self.height, self.width
+        nStates = height * width
+
+        # Boolean map of blocked squares and map of rewards for landing in a square
+        blocked = self._blockedMask()
+        landingReward = np.zeros(nStates)
+        for pos, reward in self.rewards.items():
+            if self._isInside(pos):
+                landingReward[pos[0] * width + pos[1]] = reward
+
+        nextState = np.empty((nStates, len(self.moves)), dtype=int)
+        reward = np.empty((nStates, len(self.moves)))
+        compiled = CompiledGridWorld(height, width, nextState, reward, blocked, landingReward)
+        self._compileRows(compiled, np.arange(nStates))
+        return compiled
+
+    def _blockedMask(self) -> np.ndarray:
+        """
+        "Private" helper function that returns a boolean array marking the blocked squares (indexed by states)
+        """
+        if self._blockedSquares is None:
+            return self._blockedBitmap.copy()
+        blocked = np.zeros(self.height * self.width, dtype=bool)
+        for pos in self._blockedSquares:
+            if self._isInside(pos):
+                blocked[pos[0] * self.width + pos[1]] = True
+        return blocked
+
+    def _updateCompiled(self, compiled: 'CompiledGridWorld', states: np.ndarray):
+        """
+        "Private" helper function that updates the compiled arrays for the given (changed) states
+        """
+        for state in states.tolist():
+            pos = divmod(state, self.width)
+            if self._blockedSquares is not None:
+                compiled.blocked[state] = pos in self._blockedSquares
+            compiled.landingReward[state] = self._rewards.get(pos, 0)
+        self._compileRows(compiled, states)
+
+    def _compileRows(self, compiled: 'CompiledGridWorld', states: np.ndarray):
+        """
+        "Private" helper function that (re)computes `nextState` and `reward` for the given states,
+        using the `blocked` and `landingReward` arrays of `compiled`
+        """
+        height, width = self.height, self.width
+
+        # Compute the target of every move from every given square at once
+        rows, cols = np.divmod(states, width)
+        moves = np.array(self.moves, dtype=int).reshape(-1, 2)
+        newRows = rows[:, None] + moves[None, :, 0]
+        newCols = cols[:, None] + moves[None, :, 1]
+        inside = (newRows >= 0) & (newRows < height) & (newCols >= 0) & (newCols < width)
+        targets = np.where(inside, newRows * width + newCols, 0)
+        valid = inside & ~compiled.blocked[targets]
+
+        # Invalid moves stay in place and receive `invalidActionReward`
+        compiled.nextState[states] = np.where(valid, targets, states[:, None])
+        compiled.reward[states] = np.where(valid, compiled.landingReward[targets], self.invalidActionReward)
+
+        # Teleportations override all actions of their square
+        isUpdated = np.zeros(height * width, dtype=bool)
+        isUpdated[states] = True
+        for pos, (target, teleportReward) in self.teleportations.items():
+            if self._isInside(pos) and isUpdated[pos[0] * width + pos[1]]:
+                # (Blocked targets are allowed here, as in `previewStep`)
+                if not self._isInside(target):
+                    raise ValueError('Teleportation target {} is outside the world'.format(target))
+                compiled.nextState[pos[0] * width + pos[1], :] = target[0] * width + target[1]
+                compiled.reward[pos[0] * width + pos[1], :] = teleportReward
+
+    def _buildSparseCompiled(self) -> 'SparseCompiledGridWorld':
+        """
+        "Private" helper function that computes the sparse transition matrices from scratch
+        """
+        height, width = self.height, self.width
+
+        # Number the free squares, `cellIndex` maps flat positions to state indices (-1 if blocked)
+        free = ~self._blockedMask()
+        cells = np.flatnonzero(free)
+        nStates = len(cells)
+        cellIndex = np.full(height * width, -1, dtype=np.int32)
+        cellIndex[cells] = np.arange(nStates, dtype=np.int32)
+        rows, cols = np.divmod(cells, width)
+
+        # Rewards for landing in each state
+        stateReward = np.zeros(nStates)
+        for pos, reward in self.rewards.items():
+            if self._isInside(pos) and free[pos[0] * width + pos[1]]:
+                stateReward[cellIndex[pos[0] * width + pos[1]]] = reward
+
+        # Compute the target of each move from every free square (invalid moves stay in place)
+        states = np.arange(nStates, dtype=np.int32)
+        nextState = np.empty((nStates, len(self.moves)), dtype=np.int32)
+        reward = np.empty((nStates, len(self.moves)))
+        for action, move in enumerate(self.moves):
+            newRows = rows + move[0]
+            newCols = cols + move[1]
+            inside = (newRows >= 0) & (newRows < height) & (newCols >= 0) & (newCols < width)
+            target = np.where(inside, cellIndex[np.where(inside, newRows * width + newCols, 0)], -1)
+            valid = target >= 0
+            nextState[:, action] = np.where(valid, target, states)
+            reward[:, action] = np.where(valid, stateReward[target], self.invalidActionReward)
+
+        # Teleportations override all actions of their square
+        for pos, (target, teleportReward) in self.teleportations.items():
+            if not (self._isInside(pos) and free[pos[0] * width + pos[1]]):
+                continue
+            if not (self._isInside(target) and free[target[0] * width + target[1]]):
+                raise ValueError('Teleportation target {} is blocked or outside the world'.format(target))
+            nextState[cellIndex[pos[0] * width + pos[1]], :] = cellIndex[target[0] * width + target[1]]
+            reward[cellIndex[pos[0] * width + pos[1]], :] = teleportReward
+
+        # Store one (deterministic) transition matrix per action
+        ones = np.ones(nStates)
+        indptr = np.arange(nStates + 1)
+        transitions = [
+            scipy.sparse.csr_matrix((ones, nextState[:, action], indptr), shape=(nStates, nStates))
+            for action in range(len(self.moves))
+        ]
+        return SparseCompiledGridWorld(height, width, transitions, reward, cellIndex, rows, cols)
+
+    def save(
+            self,
+            file,
+            values: Optional[Union[dict[Pos, numeric], np.ndarray]] = None,
+            policy: Optional[Union[dict[Pos, Union[int, Iterable[int]]], np.ndarray]] = None,
+        ):
+        """
+        Save the gridworld (and optionally a value function and policy) to a compressed `.npz` file.
+        Blocked squares are stored as a bitmap, rewards, teleportations and labels as arrays.
+        `values` can be a dict or an array indexed by states, `policy` a dict (as in `drawWorld`)
+        or a boolean array of shape (S, A) marking the chosen actions.
+        """
+        height, width = self.height, self.width
+        nStates = height * width
+        data = dict(
+            height=height,
+            width=width,
+            pos=np.array(self.pos),
+            moves=np.array(self.moves, dtype=int).reshape(-1, 2),
+            moveLabels=np.array(self.moveLabels, dtype=str),
+            invalidActionReward=np.array(self.invalidActionReward),
+            blocked=np.packbits(self._blockedMask()),
+            labelPositions=np.array(list(self.positionLabels.keys()), dtype=int).reshape(-1, 2),
+            labels=np.array(list(self.positionLabels.values()), dtype=str),
+            rewardPositions=np.array(list(self.rewards.keys()), dtype=int).reshape(-1, 2),
+            rewardValues=np.array(list(self.rewards.values()), dtype=float),
+            teleportFrom=np.array(list(self.teleportations.keys()), dtype=int).reshape(-1, 2),
+            teleportTo=np.array([target for target, _ in self.teleportations.values()], dtype=int).reshape(-1, 2),
+            teleportRewards=np.array([reward for _, reward in self.teleportations.values()], dtype=float),
+        )
+        if values is not None:
+            if isinstance(values, dict):
+                valueArray = np.full(nStates, np.nan)
+                for pos, value in values.items():
+                    valueArray[pos[0] * width + pos[1]] = value
+                values = valueArray
+            data['values'] = np.asarray(values, dtype=float).reshape(nStates)
+        if policy is not None:
+            if isinstance(policy, dict):
+                policyArray = np.zeros((nStates, len(self.moves)), dtype=bool)
+                for pos, actions in policy.items():
+                    if isinstance(actions, (int, np.integer)):
+                        actions = [actions]
+                    policyArray[pos[0] * width + pos[1], list(actions)] = True
+                policy = policyArray
+            data['policy'] = np.packbits(np.asarray(policy, dtype=bool), axis=1)
+        np.savez_compressed(file, **data)
+
+    @staticmethod
+    def load(file, sparse: Optional[bool] = None) -> tuple['GridWorld', Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        Load a gridworld saved with `save()`. The dynamics are compiled on first use (directly from the stored
+        bitmap of blocked squares), with `sparse=False`/`sparse=True` the dense/sparse version is compiled right away.
+        Returns the gridworld, the values (array indexed by states, NaN where missing) and the policy
+        (boolean array of shape (S, A)), the latter two are `None` if they were not saved.
+        """
+        with np.load(file) as data:
+            height, width = int(data['height']), int(data['width'])
+            gw = GridWorld(height, width)
+            gw.pos = tuple(data['pos'].tolist())
+            gw.moves = [tuple(move) for move in data['moves'].tolist()]
+            gw.moveLabels = data['moveLabels'].tolist()
+            gw.invalidActionReward = data['invalidActionReward'].item()
+            gw.positionLabels = dict(zip(map(tuple, data['labelPositions'].tolist()), data['labels'].tolist()))
+            gw.rewards = dict(zip(map(tuple, data['rewardPositions'].tolist()), data['rewardValues'].tolist()))
+            gw.teleportations = dict(zip(
+                map(tuple, data['teleportFrom'].tolist()),
+                zip(map(tuple, data['teleportTo'].tolist()), data['teleportRewards'].tolist()),
+            ))
+            gw._blockedSquares = None
+            gw._blockedBitmap = np.unpackbits(data['blocked'], count=height * width).astype(bool)
+            values = data['values'] if 'values' in data else None
+            policy = None
+            if 'policy' in data:
+                policy = np.unpackbits(data['policy'], axis=1, count=len(gw.moves)).astype(bool)
+        if sparse is not None:
+            gw.compile(sparse)
+        return gw, values, policy
+
+    def _isInside(self, pos) -> bool:
+        """
+        "Private" helper function that checks if a position is inside the world
+        """
+        return 0 <= pos[0] < self.height and 0 <= pos[1] < self.width
+
     
     def drawWorld(
             self,
@@ -124,15 +623,26 @@ class GridWorld:
             policy: dict[Pos, Union[int, Iterable[int]]] = dict(),
             values: dict[Pos, numeric] = dict(),
             path: Optional[Sequence[Pos]] = None,
+            raster: bool = False,
+            drawColorbar: bool = False,
         ):
         """
-        Draw the gridworld into the axes `ax`, including infos specified by `drawXXX`
+        Draw the gridworld into the axes `ax`, including infos specified by `drawXXX`.
+        With `raster=True` the squares are drawn as a single image instead of a table
+        (much faster for large worlds): `values` are shown as a heat-map instead of numbers
+        (an array of shape (height, width) can be passed as well), `policy` as arrows.
+        `drawColorbar=True` adds a colorbar for the heat-map next to `ax` (a new one on every call).
         """
 
         # Prepare axes, empty table
         if ax is None:
             ax = plt.axes()
         ax.set_axis_off()
+        if raster:
+            self._drawRaster(
+                ax, title, drawLabels, drawPos, drawTeleportations, drawRewards, drawBlocked, policy, values, path, drawColorbar
+            )
+            return
         tb = matplotlib.table.Table(ax, bbox=[0, 0, 1, 1])
         cellHeight = 1.0 / self.height
         cellWidth = 1.0 / self.width
@@ -200,13 +710,112 @@ class GridWorld:
             ax.plot(x, y)
             pass
 
-    def play(self):
+    def _drawRaster(
+            self, ax, title, drawLabels, drawPos, drawTeleportations, drawRewards, drawBlocked, policy, values, path, drawColorbar
+        ):
+        """
+        "Private" helper function that implements `drawWorld(raster=True)`
+        """
+        height, width = self.height, self.width
+
+        # Value heat-map (NaN where no value is given)
+        if isinstance(values, np.ndarray):
+            valueGrid = np.asarray(values, dtype=float).reshape(height, width)
+        else:
+            valueGrid = np.full((height, width), np.nan)
+            if len(values) > 0:
+                positions = np.array(list(values.keys()), dtype=int).reshape(-1, 2)
+                valueGrid[positions[:, 0], positions[:, 1]] = list(values.values())
+
+        # Compose one RGBA image: white background, value colors, grey blocked squares
+        image = np.ones((height, width, 4))
+        hasValue = ~np.isnan(valueGrid)
+        if hasValue.any():
+            norm = matplotlib.colors.Normalize(np.min(valueGrid[hasValue]), np.max(valueGrid[hasValue]))
+            image[hasValue] = plt.get_cmap('viridis')(norm(valueGrid[hasValue]))
+        if drawBlocked:
+            blocked = self._blockedMask().reshape(height, width)
+            image[blocked] = matplotlib.colors.to_rgba('grey')
+        ax.imshow(image, extent=(0, 1, 0, 1), aspect='auto', interpolation='nearest')
+        if drawColorbar and hasValue.any():
+            ax.figure.colorbar(matplotlib.cm.ScalarMappable(norm, 'viridis'), ax=ax)
+
+        # Policy arrows, all drawn with a single call
+        arrows = []
+        for pos, policyMoves in policy.items():
+            if isinstance(policyMoves, (int, np.integer)):
+                policyMoves = [policyMoves]
+            for move in policyMoves:
+                arrows.append((pos[0], pos[1], self.moves[move][0], self.moves[move][1]))
+        if len(arrows) > 0:
+            rows, cols, moveRows, moveCols = np.array(arrows, dtype=float).T
+            ax.quiver(
+                (1/2 + cols) / width,
+                1 - (1/2 + rows) / height,
+                0.4 * moveCols / width,
+                -0.4 * moveRows / height,
+                angles='xy', scale_units='xy', scale=1, pivot='tail', color='black',
+            )
+
+        # Text is only drawn for the (few) squares that have labels, teleportations or rewards
+        texts: dict[Pos, list[str]] = dict()
+        if drawLabels:
+            for pos, label in self.positionLabels.items():
+                texts.setdefault(pos, []).append(label)
+        if drawTeleportations:
+            for pos, (target, reward) in self.teleportations.items():
+                targetLabel = self.positionLabels.get(target, str(target))
+                texts.setdefault(pos, []).append('*{to} ({reward:+})'.format(to = targetLabel, reward = reward))
+        if drawRewards:
+            for pos, reward in self.rewards.items():
+                texts.setdefault(pos, []).append('{reward:+}'.format(reward = reward))
+        for pos, infos in texts.items():
+            ax.text(*self.posToXy(pos), '\n'.join(infos), ha='center', va='center')
+        if drawPos:
+            ax.text(*self.posToXy(self.pos), '\U0001F600', ha='center', va='center')
+
+        ax.set_title(title)
+        ax.set_xlim([0, 1])
+        ax.set_ylim([0, 1])
+
+        # Draw path if given
+        if path is not None:
+            ax.plot(*zip(*[self.posToXy(pos) for pos in path]))
+
+    def play(self, raster: bool = False):
         ax = plt.axes()
+        canvas = ax.figure.canvas
         totalRewards = 0
         counter = 0
+
+        # Direction of each move in plot coordinates (x to the right, y upwards), computed once
+        moveDirections = np.array([normalizeVector(np.array((move[1], -move[0]))) for move in self.moves])
+
+        # The world itself is drawn only once, the agent, its path and the title are updated after each move.
+        # If the backend supports it, these are "animated" artists that are blitted onto a saved background.
+        useBlit = canvas.supports_blit
+        self.drawWorld(ax, 'Click the gridworld to play!', drawPos=False, raster=raster)
+        ax.set_xlim([0, 1])
+        ax.set_ylim([0, 1])
+        path = [self.posToXy(self.pos)]
+        (pathLine,) = ax.plot(*zip(*path), animated=useBlit)
+        agent = ax.text(*path[0], '\U0001F600', ha='center', va='center', animated=useBlit)
+        ax.title.set_animated(useBlit)
+        dynamicArtists = [pathLine, agent, ax.title]
+        background = None
+
+        def onDraw(event):
+            # Save the background after every full redraw (e.g. on resize), then draw the dynamic artists on top
+            nonlocal background
+            background = canvas.copy_from_bbox(ax.figure.bbox)
+            for artist in dynamicArtists:
+                ax.draw_artist(artist)
+
         def onClick(event):
             nonlocal totalRewards
             nonlocal counter
+            if event.inaxes is not ax:
+                return
             counter += 1
             # Compute direction of click
             xy0 = np.array(self.posToXy(self.pos))
@@ -214,15 +823,12 @@ class GridWorld:
             clickDir = normalizeVector(xy1 - xy0)
             
             # Find matching move
-            normalizedMoves = [normalizeVector(move) for move in self.moves]
-            scores = [np.dot((move[1], -move[0]), clickDir) for move in normalizedMoves]
-            move = np.argmax(scores)
+            move = np.argmax(moveDirections @ clickDir)
             
-            # Make move and re-draw image
+            # Make move and update the dynamic artists
             (pos, reward) = self.step(move)
             totalRewards += reward
             print(xy0, ' -> ', xy1, ' ~ ', clickDir, ' : ', move, '   --->   ', pos, ' (Reward: ', reward, ')')
-            ax.clear()
             txt = '   -   '.join([
                 '#' + str(counter),
                 'Action: ' + self.moveLabels[move],
@@ -230,10 +836,23 @@ class GridWorld:
                 'Reward: ' + str(reward),
                 'Total: ' + str(totalRewards)
             ])
-            self.drawWorld(ax, txt)
-            plt.draw()
-        self.drawWorld(ax, 'Click the gridworld to play!')
-        ax.figure.canvas.mpl_connect('button_press_event', onClick)
+            ax.title.set_text(txt)
+            agent.set_position(self.posToXy(pos))
+            path.append(self.posToXy(pos))
+            pathLine.set_data(*zip(*path))
+
+            # Redraw only the dynamic artists if possible
+            if useBlit and background is not None:
+                canvas.restore_region(background)
+                for artist in dynamicArtists:
+                    ax.draw_artist(artist)
+                canvas.blit(ax.figure.bbox)
+            else:
+                canvas.draw_idle()
+
+        if useBlit:
+            canvas.mpl_connect('draw_event', onDraw)
+        canvas.mpl_connect('button_press_event', onClick)
         plt.show()
     
     def posToXy(self, pos: tuple[int, int]):
@@ -241,6 +860,145 @@ class GridWorld:
         y = 1 - (1/2 + pos[0]) / self.height
         return (x, y)
 
+class CompiledGridWorld:
+    """
+    Array representation of the dynamics of a `GridWorld`, as returned by `GridWorld.compile()`
+    """
+    def __init__(
+            self,
+            height: int,
+            width: int,
+            nextState: np.ndarray,
+            reward: np.ndarray,
+            blocked: np.ndarray,
+            landingReward: np.ndarray,
+        ):
+        self.height = height
+        self.width = width
+
+        # `nextState[s, a]` and `reward[s, a]` are the result of `previewStep(a, pos(s))`
+        self.nextState = nextState
+        self.reward = reward
+
+        # `blocked[s]` is True if state `s` cannot be moved onto,
+        # `landingReward[s]` is the reward for moving onto it
+        self.blocked = blocked
+        self.landingReward = landingReward
+
+        # `GridWorld.version` these arrays correspond to
+        self.version = 0
+
+    @property
+    def nStates(self) -> int:
+        return self.nextState.shape[0]
+
+    @property
+    def nActions(self) -> int:
+        return self.nextState.shape[1]
+
+    def stateIndex(self, pos: Pos) -> int:
+        return pos[0] * self.width + pos[1]
+
+    def statePos(self, state: int) -> Pos:
+        return divmod(int(state), self.width)
+
+    def openStates(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the indices, rows and columns of all states that are not blocked
+        """
+        states = np.flatnonzero(~self.blocked)
+        rows, cols = np.divmod(states, self.width)
+        return states, rows, cols
+
+    def nextValues(self, values: np.ndarray) -> np.ndarray:
+        """
+        Values of the next state for each state and action, shape (S, A)
+        """
+        return values[self.nextState]
+
+    def policyOperator(self, probs: np.ndarray):
+        """
+        Returns a function mapping `values` to the expected value of the next state under the policy `probs`
+        """
+        return lambda values: np.sum(probs * values[self.nextState], axis=1)
+
+
+class SparseCompiledGridWorld:
+    """
+    Sparse representation of the dynamics of a `GridWorld`, as returned by `GridWorld.compile(sparse=True)`.
+    Only squares that are not blocked are states, so mostly blocked worlds need much less memory.
+    """
+    def __init__(
+            self,
+            height: int,
+            width: int,
+            transitions: list[scipy.sparse.csr_matrix],
+            reward: np.ndarray,
+            cellIndex: np.ndarray,
+            rows: np.ndarray,
+            cols: np.ndarray,
+        ):
+        self.height = height
+        self.width = width
+
+        # `transitions[a]` is an (S, S) matrix with a single 1 per row at the next state
+        self.transitions = transitions
+        self.reward = reward
+
+        # Mapping between flat positions `row * width + col` and states (-1 if blocked) and back
+        self.cellIndex = cellIndex
+        self.rows = rows
+        self.cols = cols
+
+        # `GridWorld.version` these arrays correspond to
+        self.version = 0
+
+    @property
+    def nStates(self) -> int:
+        return self.reward.shape[0]
+
+    @property
+    def nActions(self) -> int:
+        return self.reward.shape[1]
+
+    def stateIndex(self, pos: Pos) -> int:
+        return int(self.cellIndex[pos[0] * self.width + pos[1]])
+
+    def statePos(self, state: int) -> Pos:
+        return (int(self.rows[state]), int(self.cols[state]))
+
+    @property
+    def nextState(self) -> np.ndarray:
+        """
+        Next state for each state and action, shape (S, A) (read from the transition matrices)
+        """
+        return np.stack([transition.indices for transition in self.transitions], axis=1)
+
+    def openStates(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the indices, rows and columns of all states (none of them are blocked)
+        """
+        return np.arange(self.nStates), self.rows, self.cols
+
+    def nextValues(self, values: np.ndarray) -> np.ndarray:
+        """
+        Values of the next state for each state and action, shape (S, A)
+        """
+        return np.stack([transition @ values for transition in self.transitions], axis=1)
+
+    def policyOperator(self, probs: np.ndarray):
+        """
+        Returns a function mapping `values` to the expected value of the next state under the policy `probs`
+        """
+        # Combine the actions into a single transition matrix once
+        combined = sum(
+            scipy.sparse.diags(probs[:, action]) @ transition
+            for action, transition in enumerate(self.transitions)
+        )
+        combined = scipy.sparse.csr_matrix(combined)
+        return lambda values: combined @ values
+
+
 def normalizeVector(v):
     return v / np.linalg.norm(v)
 
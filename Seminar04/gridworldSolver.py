@@ -0,0 +1,405 @@
+import heapq
+import time
+import numpy as np
+from typing import Optional, Union, Iterable, Callable
+
+from convergenceTrace import SweepCallback
+from gridworld import GridWorld, CompiledGridWorld, SparseCompiledGridWorld, Pos, numeric
+
+# Default discount factor and tolerance (same as in the notebooks)
+GAMMA = 0.9
+THETA = 1e-12
+
+Policy = dict[Pos, Union[int, Iterable[int]]]
+Compiled = Union[CompiledGridWorld, SparseCompiledGridWorld]
+
+
+def evaluatePolicy(
+        gw: GridWorld,
+        policy: Optional[Union[Policy, np.ndarray]] = None,
+        gamma: float = GAMMA,
+        theta: float = THETA,
+        sparse: bool = False,
+        callback: Optional[SweepCallback] = None,
+    ) -> dict[Pos, float]:
+    """
+    Evaluate `policy` on `gw` with synchronous sweeps over all states at once.
+    `policy` uses the same format as `GridWorld.drawWorld`: a single action is followed deterministically,
+    a list of actions is followed with equal probabilities and states that are missing (or map to an
+    empty list) choose uniformly among all actions. `policy=None` is the uniformly random policy.
+    An array of shape (S, A) with action probabilities per state can be passed instead of a dict.
+    Returns a dict with the value of each (non-blocked) position, suitable for `drawWorld(values=...)`.
+    With `sparse=True` the sparse representation from `gw.compile(sparse=True)` is used.
+    `callback` (e.g. a `ConvergenceTrace`) is called after every sweep with delta, updates and duration.
+    """
+    compiled = gw.compile(sparse)
+    probs = policyToArray(compiled, policy)
+    values = evaluatePolicyArray(compiled, probs, gamma, theta, callback=callback)
+    return arrayToDict(compiled, values)
+
+
+def valueIteration(
+        gw: GridWorld,
+        gamma: float = GAMMA,
+        theta: float = THETA,
+        sparse: bool = False,
+        callback: Optional[SweepCallback] = None,
+    ) -> tuple[dict[Pos, float], dict[Pos, list[int]]]:
+    """
+    Compute the optimal values of `gw` with synchronous value iteration.
+    Returns the values and the greedy policy (all actions within `2*theta` of the best one),
+    both as dicts suitable for `drawWorld(values=..., policy=...)`.
+    With `sparse=True` the sparse representation from `gw.compile(sparse=True)` is used.
+    `callback` (e.g. a `ConvergenceTrace`) is called after every sweep with delta, updates and duration.
+    """
+    compiled = gw.compile(sparse)
+    values = valueIterationArray(compiled, gamma, theta, callback=callback)
+    policy = greedyPolicyArray(compiled, values, gamma, 2 * theta)
+    return arrayToDict(compiled, values), arrayToPolicy(compiled, policy)
+
+
+def prioritizedSweeping(
+        gw: GridWorld,
+        gamma: float = GAMMA,
+        theta: float = THETA,
+        values: Optional[dict[Pos, float]] = None,
+        sparse: bool = False,
+    ) -> tuple[dict[Pos, float], dict[Pos, list[int]]]:
+    """
+    Compute the optimal values of `gw` with asynchronous value iteration, always updating the state
+    with the largest Bellman error first and only revisiting the predecessors of states that changed.
+    `values` (e.g. the result of an earlier call) can be used as a starting point: after small changes
+    to the world only the states affected by the change are updated.
+    Returns values and greedy policy in the same format as `valueIteration`.
+    """
+    compiled = gw.compile(sparse)
+    initialValues = None if values is None else dictToArray(compiled, values)
+    values = prioritizedSweepingArray(compiled, gamma, theta, initialValues)
+    policy = greedyPolicyArray(compiled, values, gamma, 2 * theta)
+    return arrayToDict(compiled, values), arrayToPolicy(compiled, policy)
+
+
+def prioritizedSweepingArray(
+        compiled: Compiled,
+        gamma: float = GAMMA,
+        theta: float = THETA,
+        values: Optional[np.ndarray] = None,
+        states: Optional[Iterable[int]] = None,
+        maxUpdates: Optional[int] = None,
+    ) -> np.ndarray:
+    """
+    Array version of `prioritizedSweeping`. The queue is initialized with `states`
+    (or with all states whose Bellman error exceeds `theta` if `states` is None).
+    Stops once no state has a Bellman error above `theta` or after `maxUpdates` updates.
+    """
+    values = _initialValues(compiled, values)
+    predecessorPtr, predecessors = predecessorsArray(compiled)
+
+    # Find the initial errors (vectorized) before switching to single-state updates
+    if states is None:
+        errors = np.abs(np.max(actionValuesArray(compiled, values, gamma), axis=1) - values)
+        states = np.flatnonzero(errors > theta)
+
+    # Single-state updates are much faster on Python lists than on NumPy arrays
+    predecessorPtr = predecessorPtr.tolist()
+    predecessors = predecessors.tolist()
+    values = values.tolist()
+    _sweepLists(
+        values,
+        compiled.nextState.tolist(),
+        compiled.reward.tolist(),
+        lambda state: predecessors[predecessorPtr[state]:predecessorPtr[state + 1]],
+        np.asarray(states).tolist(),
+        gamma,
+        theta,
+        maxUpdates,
+    )
+    return np.array(values)
+
+
+def _sweepLists(
+        values: list[float],
+        nextState: list[list[int]],
+        reward: list[list[float]],
+        predecessorsOf: Callable[[int], Iterable[int]],
+        states: Iterable[int],
+        gamma: float,
+        theta: float,
+        maxUpdates: Optional[int] = None,
+    ) -> int:
+    """
+    Prioritized sweeping on Python lists, updates `values` in place and returns the number of updates
+    """
+    def bestValue(state):
+        return max(r + gamma * values[s] for r, s in zip(reward[state], nextState[state]))
+
+    # Initialize the queue (a heap of negative errors), `queued` holds the priority a state was last queued with
+    queued = [0.0] * len(values)
+    queue = []
+    for state in set(states):
+        error = abs(bestValue(state) - values[state])
+        if error > theta:
+            queued[state] = error
+            queue.append((-error, state))
+    heapq.heapify(queue)
+
+    nUpdates = 0
+    while queue and (maxUpdates is None or nUpdates < maxUpdates):
+        _, state = heapq.heappop(queue)
+        if queued[state] == 0:
+            # Outdated entry (the state was already updated)
+            continue
+        queued[state] = 0
+
+        # Update the state, then re-prioritize all states that can lead to it
+        values[state] = bestValue(state)
+        nUpdates += 1
+        for predecessor in predecessorsOf(state):
+            error = abs(bestValue(predecessor) - values[predecessor])
+            if error > theta and error > queued[predecessor]:
+                queued[predecessor] = error
+                heapq.heappush(queue, (-error, predecessor))
+
+    return nUpdates
+
+
+class IncrementalSolver:
+    """
+    Keeps the optimal values of a `GridWorld` up to date while the world is being edited.
+    After changes to `rewards`, `teleportations` or `blockedSquares`, `solve()` only updates the
+    affected rows of the compiled dynamics and continues from the previous values with prioritized
+    sweeping, starting at the changed states (falling back to value iteration if that takes too many updates).
+    Other changes lead to a full (warm-started) solve.
+    """
+    def __init__(self, gw: GridWorld, gamma: float = GAMMA, theta: float = THETA):
+        self.gw = gw
+        self.gamma = gamma
+        self.theta = theta
+
+        # Compiled dynamics (and the version of `gw`) the current values belong to
+        self._compiled: Optional[CompiledGridWorld] = None
+        self._version: Optional[int] = None
+
+        # Copies of the dynamics as Python lists, with a set of predecessors for each state
+        self._values: list[float] = []
+        self._nextState: list[list[int]] = []
+        self._reward: list[list[float]] = []
+        self._predecessors: list[set[int]] = []
+
+        self.solve()
+
+    @property
+    def values(self) -> np.ndarray:
+        return np.array(self._values)
+
+    def solve(self) -> np.ndarray:
+        """
+        Bring the values up to date with the gridworld and return them (array indexed by states)
+        """
+        compiled = self.gw.compile()
+        if compiled is not self._compiled:
+            self._fullSolve(compiled)
+        elif compiled.version != self._version:
+            changedStates = self.gw.changedStates(self._version)
+            if changedStates is None:
+                self._fullSolve(compiled)
+            else:
+                self._updateRows(changedStates)
+                # Single-state updates are slow, so large edits that affect most of the world
+                # are finished with (vectorized) value iteration starting from the current values
+                maxUpdates = max(10 * len(changedStates), compiled.nStates // 10)
+                nUpdates = _sweepLists(
+                    self._values,
+                    self._nextState,
+                    self._reward,
+                    self._predecessors.__getitem__,
+                    changedStates.tolist(),
+                    self.gamma,
+                    self.theta,
+                    maxUpdates,
+                )
+                if nUpdates >= maxUpdates:
+                    self._values = valueIterationArray(compiled, self.gamma, self.theta, self.values).tolist()
+        self._version = compiled.version
+        return self.values
+
+    def valuesDict(self) -> dict[Pos, float]:
+        return arrayToDict(self._compiled, self.values)
+
+    def policyDict(self) -> dict[Pos, list[int]]:
+        policy = greedyPolicyArray(self._compiled, self.values, self.gamma, 2 * self.theta)
+        return arrayToPolicy(self._compiled, policy)
+
+    def _fullSolve(self, compiled: CompiledGridWorld):
+        # Reuse the previous values as a starting point if the number of states did not change
+        values = self.values if len(self._values) == compiled.nStates else None
+        self._values = valueIterationArray(compiled, self.gamma, self.theta, values).tolist()
+        self._nextState = compiled.nextState.tolist()
+        self._reward = compiled.reward.tolist()
+        self._predecessors = [set() for _ in range(compiled.nStates)]
+        for state, targets in enumerate(self._nextState):
+            for target in targets:
+                self._predecessors[target].add(state)
+        self._compiled = compiled
+
+    def _updateRows(self, states: np.ndarray):
+        # Copy the changed rows of the compiled dynamics, keeping the predecessor sets in sync
+        newNextState = self._compiled.nextState[states].tolist()
+        newReward = self._compiled.reward[states].tolist()
+        for state, targets, rewards in zip(states.tolist(), newNextState, newReward):
+            for target in self._nextState[state]:
+                self._predecessors[target].discard(state)
+            for target in targets:
+                self._predecessors[target].add(state)
+            self._nextState[state] = targets
+            self._reward[state] = rewards
+
+
+def predecessorsArray(compiled: Compiled) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reverse transitions in CSR format: the states that can move to `s` in one step are
+    `predecessors[predecessorPtr[s]:predecessorPtr[s + 1]]` (without duplicates).
+    """
+    nStates = compiled.nStates
+    sources = np.repeat(np.arange(nStates, dtype=np.int64), compiled.nActions)
+    pairs = np.unique(compiled.nextState.ravel().astype(np.int64) * nStates + sources)
+    targets, sources = np.divmod(pairs, nStates)
+    predecessorPtr = np.concatenate([[0], np.cumsum(np.bincount(targets, minlength=nStates))])
+    return predecessorPtr, sources
+
+
+def evaluatePolicyArray(
+        compiled: Compiled,
+        probs: np.ndarray,
+        gamma: float = GAMMA,
+        theta: float = THETA,
+        values: Optional[np.ndarray] = None,
+        callback: Optional[SweepCallback] = None,
+    ) -> np.ndarray:
+    """
+    Array version of `evaluatePolicy`: `probs[s, a]` are the action probabilities,
+    `values` (if given) is used as the initial guess. Returns an array of length S.
+    """
+    # The expected immediate reward and the transitions do not change between sweeps
+    expectedReward = np.sum(probs * compiled.reward, axis=1)
+    expectedNextValues = compiled.policyOperator(probs)
+    values = _initialValues(compiled, values)
+    while True:
+        if callback is not None:
+            sweepStart = time.perf_counter()
+        newValues = expectedReward + gamma * expectedNextValues(values)
+        delta = np.max(np.abs(newValues - values), initial=0)
+        values = newValues
+        if callback is not None:
+            callback(delta, compiled.nStates, time.perf_counter() - sweepStart)
+        if delta < theta:
+            break
+    return values
+
+
+def valueIterationArray(
+        compiled: Compiled,
+        gamma: float = GAMMA,
+        theta: float = THETA,
+        values: Optional[np.ndarray] = None,
+        callback: Optional[SweepCallback] = None,
+    ) -> np.ndarray:
+    """
+    Array version of `valueIteration`: returns the optimal values as an array of length S.
+    """
+    values = _initialValues(compiled, values)
+    while True:
+        if callback is not None:
+            sweepStart = time.perf_counter()
+        newValues = np.max(actionValuesArray(compiled, values, gamma), axis=1)
+        delta = np.max(np.abs(newValues - values), initial=0)
+        values = newValues
+        if callback is not None:
+            callback(delta, compiled.nStates, time.perf_counter() - sweepStart)
+        if delta < theta:
+            break
+    return values
+
+
+def actionValuesArray(compiled: Compiled, values: np.ndarray, gamma: float = GAMMA) -> np.ndarray:
+    """
+    Compute `reward + gamma * value of next state` for all states and actions, shape (S, A).
+    """
+    return compiled.reward + gamma * compiled.nextValues(values)
+
+
+def greedyPolicyArray(
+        compiled: Compiled,
+        values: np.ndarray,
+        gamma: float = GAMMA,
+        tol: float = 2 * THETA,
+    ) -> np.ndarray:
+    """
+    Boolean array of shape (S, A) marking all actions within `tol` of the best action value.
+    """
+    actionValues = actionValuesArray(compiled, values, gamma)
+    return actionValues >= np.max(actionValues, axis=1, keepdims=True) - tol
+
+
+def policyToArray(compiled: Compiled, policy: Optional[Union[Policy, np.ndarray]]) -> np.ndarray:
+    """
+    Convert a policy dict (format as in `drawWorld`) to an array of action probabilities, shape (S, A).
+    """
+    if isinstance(policy, np.ndarray):
+        return policy
+
+    # Start from the uniformly random policy, then overwrite the specified states
+    probs = np.full((compiled.nStates, compiled.nActions), 1 / compiled.nActions)
+    if policy is None:
+        return probs
+    for pos, actions in policy.items():
+        if isinstance(actions, (int, np.integer)):
+            actions = [actions]
+        actions = list(actions)
+        if len(actions) == 0:
+            continue
+        state = compiled.stateIndex(pos)
+        if state < 0:
+            continue
+        probs[state] = 0
+        for action in actions:
+            probs[state, action] += 1 / len(actions)
+    return probs
+
+
+def arrayToDict(compiled: Compiled, array: np.ndarray) -> dict[Pos, numeric]:
+    """
+    Convert an array indexed by states to a dict indexed by (non-blocked) positions.
+    """
+    states, rows, cols = compiled.openStates()
+    return dict(zip(zip(rows.tolist(), cols.tolist()), array[states].tolist()))
+
+
+def arrayToPolicy(compiled: Compiled, policy: np.ndarray) -> dict[Pos, list[int]]:
+    """
+    Convert a boolean array of shape (S, A) to a policy dict with a list of actions per position.
+    """
+    states, rows, cols = compiled.openStates()
+    actions = range(compiled.nActions)
+    return {
+        pos: [a for a, isGreedy in zip(actions, row) if isGreedy]
+        for pos, row in zip(zip(rows.tolist(), cols.tolist()), policy[states].tolist())
+    }
+
+
+def dictToArray(compiled: Compiled, values: dict[Pos, numeric]) -> np.ndarray:
+    """
+    Convert a dict indexed by positions to an array indexed by states (0 for missing positions).
+    """
+    array = np.zeros(compiled.nStates)
+    for pos, value in values.items():
+        state = compiled.stateIndex(pos)
+        if state >= 0:
+            array[state] = value
+    return array
+
+
+def _initialValues(compiled: Compiled, values: Optional[np.ndarray]) -> np.ndarray:
+    if values is None:
+        return np.zeros(compiled.nStates)
+    return np.array(values, dtype=float)
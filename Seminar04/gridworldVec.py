@@ -0,0 +1,79 @@
+import numpy as np
+from typing import Optional, Iterable
+
+from gridworld import GridWorld, Pos
+
+
+class VecGridWorld:
+    """
+    Many independent agents in the same `GridWorld`, all stepped at once with NumPy.
+    The dynamics are the same as `GridWorld.previewStep` (teleportations, rewards, blocked squares).
+    """
+    def __init__(
+            self,
+            gw: GridWorld,
+            nEnvs: int,
+            startPos: Optional[Pos] = None,
+            terminalStates: Iterable[Pos] = (),
+            maxSteps: Optional[int] = None,
+        ):
+        """
+        `startPos` defaults to `gw.pos`. An episode ends when an agent lands on one of `terminalStates`
+        or after `maxSteps` steps; the agent is then put back to `startPos` automatically.
+        Changes to `gw` after initialization are only picked up by `reset()`.
+        """
+        self.gw = gw
+        self.nEnvs = nEnvs
+        self.startPos = gw.pos if startPos is None else startPos
+        self.terminalStates = list(terminalStates)
+        self.maxSteps = maxSteps
+        self.reset()
+
+    def reset(self) -> np.ndarray:
+        """
+        Put all agents back to the start position (and re-read the dynamics of the gridworld).
+        Returns the positions as an int32 array of shape (N, 2).
+        """
+        compiled = self.gw.compile()
+        self._width = compiled.width
+        self._nextState = compiled.nextState.astype(np.int32)
+        self._reward = compiled.reward.copy()
+        self._isTerminal = np.zeros(compiled.nStates, dtype=bool)
+        for pos in self.terminalStates:
+            self._isTerminal[compiled.stateIndex(pos)] = True
+        self._startState = compiled.stateIndex(self.startPos)
+
+        # Current state and number of steps in the current episode of each agent
+        self.states = np.full(self.nEnvs, self._startState, dtype=np.int32)
+        self.episodeSteps = np.zeros(self.nEnvs, dtype=np.int32)
+
+        # Marks the agents whose episode ended (and that were reset) in the last step
+        self.dones = np.zeros(self.nEnvs, dtype=bool)
+        return self.positions
+
+    @property
+    def positions(self) -> np.ndarray:
+        """
+        Positions of all agents as an int32 array of shape (N, 2) with rows and columns.
+        """
+        rows, cols = np.divmod(self.states, self._width)
+        return np.stack([rows, cols], axis=1).astype(np.int32)
+
+    def step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Make one step with every agent, `actions[i]` is the action of agent `i`.
+        Returns the new positions (after resetting finished episodes) and the rewards.
+        """
+        actions = np.asarray(actions)
+        rewards = self._reward[self.states, actions]
+        self.states = self._nextState[self.states, actions]
+        self.episodeSteps += 1
+
+        # Reset agents whose episode has ended
+        self.dones = self._isTerminal[self.states]
+        if self.maxSteps is not None:
+            self.dones |= self.episodeSteps >= self.maxSteps
+        self.states[self.dones] = self._startState
+        self.episodeSteps[self.dones] = 0
+
+        return self.positions, rewards
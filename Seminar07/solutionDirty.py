@@ -10,35 +10,40 @@
 
 
 
+import time
 import matplotlib.pyplot as plt
 import numpy as np
 
-from stackjackClass import StackJack, ACTION_STAND, ACTION_STACK_1, ACTION_STACK_2
+from convergenceTrace import ConvergenceTrace
+from stackjackClass import StackJack, StackJackRules, ACTION_STAND, ACTION_STACK_1, ACTION_STACK_2
 
 
 ### Define constants etc.
 
+# Rules of the game (change e.g. `StackJackRules(BUST=30)` to try a variant)
+RULES = StackJackRules()
+
 # Point where the player goes bust.
 # We use this index to encode the terminal state
 # (even if the player decided to stand).
-BUST = 27
+BUST = RULES.BUST
 
 # "Cost" of drawing a card
-REWARD_CARD = -1
+REWARD_CARD = RULES.REWARD_CARD
 
 # Rewards for the different outcomes
-REWARD_WIN = 10
-REWARD_DRAW = 0
-REWARD_LOST = -10
-REWARD_BUST = -20
+REWARD_WIN = RULES.REWARD_WIN
+REWARD_DRAW = RULES.REWARD_DRAW
+REWARD_LOST = RULES.REWARD_LOST
+REWARD_BUST = RULES.REWARD_BUST
 
 # Stacks that cards are drawn from
-STACK1 = list(range(1, 6))
-STACK2 = list(range(11, 16))
-DEALER_STACK = list(range(20, 27))
+STACK1 = list(RULES.STACK1)
+STACK2 = list(RULES.STACK2)
+DEALER_STACK = list(RULES.DEALER_STACK)
 
 # List of possible states
-STATES = list(range(BUST + 1))
+STATES = RULES.STATES
 
 # List of possible actions
 ACTIONS = [ACTION_STAND, ACTION_STACK_1, ACTION_STACK_2]
@@ -49,6 +54,9 @@ THETA = 1e-15
 # No discounting necessary -> gamma is 1
 GAMMA = 1
 
+# Set to `{}` to record a `ConvergenceTrace` of each loop below (e.g. `TRACES['optimal']`)
+TRACES = None
+
 
 
 
@@ -61,7 +69,10 @@ print('Evaluate policy "stand"')
 # We use one extra slot for the terminal state after going bust
 values = np.zeros(BUST + 1)
 
+trace = None if TRACES is None else TRACES.setdefault('stand', ConvergenceTrace())
 while True:
+    if trace is not None:
+        sweepStart = time.perf_counter()
     Delta = 0
     # We do not need to update the terminal state (BUST)
     # Iterate over all other states
@@ -87,6 +98,8 @@ while True:
 
     # stop if no significant change:
     print(Delta)
+    if trace is not None:
+        trace(Delta, BUST, time.perf_counter() - sweepStart)
     if Delta < THETA:
         break
 
@@ -107,7 +120,10 @@ print('Evaluate policy "stack 0"')
 # We use one extra slot for the terminal state after going bust
 values = np.zeros(BUST + 1)
 
+trace = None if TRACES is None else TRACES.setdefault('stack0', ConvergenceTrace())
 while True:
+    if trace is not None:
+        sweepStart = time.perf_counter()
     Delta = 0
     # We do not need to update the terminal state (BUST)
     # Iterate over all other states
@@ -130,6 +146,8 @@ while True:
 
     # stop if no significant change:
     print(Delta)
+    if trace is not None:
+        trace(Delta, BUST, time.perf_counter() - sweepStart)
     if Delta < THETA:
         break
 
@@ -153,7 +171,10 @@ P_STACK1 = 0.2
 # We use one extra slot for the terminal state after going bust
 values = np.zeros(BUST + 1)
 
+trace = None if TRACES is None else TRACES.setdefault('random', ConvergenceTrace())
 while True:
+    if trace is not None:
+        sweepStart = time.perf_counter()
     Delta = 0
     # We do not need to update the terminal state (BUST)
     # Iterate over all other states
@@ -205,6 +226,8 @@ while True:
 
     # stop if no significant change:
     print(Delta)
+    if trace is not None:
+        trace(Delta, BUST, time.perf_counter() - sweepStart)
     if Delta < THETA:
         break
 
@@ -224,7 +247,10 @@ print('Find optimal policy')
 values = np.zeros(BUST + 1)
 policyInds = [0] * BUST
 
+trace = None if TRACES is None else TRACES.setdefault('optimal', ConvergenceTrace())
 while True:
+    if trace is not None:
+        sweepStart = time.perf_counter()
     Delta = 0
     # We do not need to update the terminal state (BUST)
     # Iterate over all other states
@@ -275,6 +301,8 @@ while True:
 
     # stop if no significant change:
     print(Delta)
+    if trace is not None:
+        trace(Delta, BUST, time.perf_counter() - sweepStart)
     if Delta < THETA:
         break
 
@@ -291,25 +319,27 @@ print(policyOptimal)
 
 ### Verify values with Monte-Carlo
 
-def evalPolicy(s0=0, n=100, p=[1, 0, 0], plot=False):
+def evalPolicy(s0=0, n=100, p=[1, 0, 0], plot=False, rng=None):
+    # Use one generator for all games, so the result only depends on the seed `rng`
+    rng = np.random.default_rng(rng)
     allRewards = []
     for i in range(n):
-        allRewards.append(playOneGame(s0, p))
+        allRewards.append(playOneGame(s0, p, rng))
     # tv = tv / n
     if plot:
         plt.hist(allRewards)
         plt.show()
     return np.mean(allRewards)
 
-def playOneGame(s0=0, policy=[1,0,0]):
-    sj = StackJack()
+def playOneGame(s0=0, policy=[1,0,0], rng=None):
+    sj = StackJack(rules=RULES, rng=rng)
     if len(policy) == 3:
         policy = [policy for s in sj.STATES]
     sj.state = s0
     value = 0
     gammaPow = 1
     while True:
-        a = np.random.choice(ACTIONS, p=policy[sj.state])
+        a = sj.rng.choice(ACTIONS, p=policy[sj.state])
         (reward, state) = sj.step(a)
         value += gammaPow * reward
         gammaPow *= GAMMA
@@ -1,5 +1,8 @@
 
-import random
+import hashlib
+from typing import NamedTuple, Optional, Union
+
+import numpy as np
 
 ACTION_STAND = 0
 ACTION_STACK_1 = 1
@@ -28,10 +31,27 @@ class StackJack:
     # List of possible states
     STATES = list(range(BUST + 1))
 
-    def __init__(self, verbose = False):
+    def __init__(
+            self,
+            verbose = False,
+            rules: Optional['StackJackRules'] = None,
+            rng: Union[np.random.Generator, int, None] = None,
+        ):
         self.state = 0
         self.verbose = verbose
 
+        # Random number generator for the card draws (a `numpy.random.Generator` or a seed),
+        # can also be used to sample actions so that a whole run is reproducible
+        self.rng = np.random.default_rng(rng)
+
+        # Use different rules than the defaults above if specified
+        # (instance attributes take precedence over the class attributes)
+        self.rules = StackJackRules() if rules is None else rules
+        if rules is not None:
+            for name, value in rules._asdict().items():
+                setattr(self, name, value)
+            self.STATES = rules.STATES
+
     def reset(self, state = 0):
         self.state = state
 
@@ -51,7 +71,7 @@ class StackJack:
 
     def _stand(self):
         # Draw a card for the dealer
-        dealerCard = random.choice(self.DEALER_STACK)
+        dealerCard = self.DEALER_STACK[self.rng.integers(len(self.DEALER_STACK))]
         self._printUpdate('Dealer card:', dealerCard)
         
         # Check the result
@@ -72,7 +92,7 @@ class StackJack:
             stack = self.STACK1
         else: # (we checked before that this can only be ACTION_STACK_2)
             stack = self.STACK2
-        card = random.choice(stack)
+        card = stack[self.rng.integers(len(stack))]
         self._printUpdate('Player card:', card)
 
         # Update the state and check if we went bust
@@ -117,6 +137,68 @@ class StackJack:
         self.verbose = oldVerbosity
 
 
+def _plainNumber(value):
+    # Python int/float for any real number (integral floats become ints)
+    value = value.item() if isinstance(value, np.generic) else value
+    return int(value) if float(value).is_integer() else float(value)
+
+
+class _StackJackRulesFields(NamedTuple):
+    BUST: int = StackJack.BUST
+    REWARD_CARD: int = StackJack.REWARD_CARD
+    REWARD_WIN: int = StackJack.REWARD_WIN
+    REWARD_DRAW: int = StackJack.REWARD_DRAW
+    REWARD_LOST: int = StackJack.REWARD_LOST
+    REWARD_BUST: int = StackJack.REWARD_BUST
+    STACK1: tuple[int, ...] = tuple(StackJack.STACK1)
+    STACK2: tuple[int, ...] = tuple(StackJack.STACK2)
+    DEALER_STACK: tuple[int, ...] = tuple(StackJack.DEALER_STACK)
+
+
+class StackJackRules(_StackJackRulesFields):
+    """
+    A variant of the rules of StackJack (defaults are the constants of the `StackJack` class).
+    Can be passed to `StackJack` and to the helper functions, and used as a (hashable) cache key.
+    The stacks can be given as any sequence, they are stored as tuples.
+    """
+    __slots__ = ()
+
+    def __new__(cls, *args, **kwargs):
+        rules = super().__new__(cls, *args, **kwargs)
+        # Plain Python numbers, so equal rules also have the same `key()` (e.g. if given as NumPy values)
+        return tuple.__new__(cls, (
+            int(rules.BUST),
+            *map(_plainNumber, rules[1:-3]),
+            *(tuple(int(card) for card in stack) for stack in rules[-3:]),
+        ))
+
+    @classmethod
+    def _make(cls, iterable):
+        # Used by `_replace`, also convert the values there
+        return cls(*iterable)
+
+    @property
+    def STATES(self) -> list[int]:
+        return list(range(self.BUST + 1))
+
+    def key(self) -> str:
+        # Hash that is stable across Python sessions (unlike `hash()`), e.g. for file names
+        return hashlib.sha1(repr(tuple(self)).encode()).hexdigest()
+
+
+def spawnSeeds(seed: Union[np.random.SeedSequence, int, None], n: int) -> list[np.random.SeedSequence]:
+    # Independent seed sequences, e.g. one per worker process of a parallel run.
+    # The same `seed` always gives the same children, so parallel runs can be repeated exactly.
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return seed.spawn(n)
+
+
+def spawnGenerators(seed: Union[np.random.SeedSequence, int, None], n: int) -> list[np.random.Generator]:
+    # Independent random number generators with the seeds from `spawnSeeds`
+    return [np.random.default_rng(child) for child in spawnSeeds(seed, n)]
+
+
 def testStackJack():
     sj = StackJack(verbose=True)
     
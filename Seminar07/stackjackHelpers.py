@@ -1,31 +1,45 @@
 
-from stackjackClass import StackJack, ACTION_STAND, ACTION_STACK_1, ACTION_STACK_2
+from stackjackClass import StackJackRules, ACTION_STAND, ACTION_STACK_1, ACTION_STACK_2
 
+import functools
+import os
+import time
 import numpy as np
+from typing import Optional
+
+from convergenceTrace import SweepCallback
 
 THETA = 1e-12
 
 GAMMA = 1
 
-def evaluatePolicy(policy):
-    values = np.zeros(StackJack.BUST + 1)
+# Rules used if none are specified (the constants of the `StackJack` class)
+DEFAULT_RULES = StackJackRules()
+
+def evaluatePolicy(policy, rules=DEFAULT_RULES, callback: Optional[SweepCallback] = None):
+    # `callback` (e.g. a `ConvergenceTrace`) is called after every sweep with delta, updates and duration
+    values = np.zeros(rules.BUST + 1)
     while True:
+        if callback is not None:
+            sweepStart = time.perf_counter()
         delta = 0
-        for state in StackJack.STATES:
+        for state in rules.STATES:
             oldValue = values[state]
             actionProbabilities = policy[state]
-            values[state] = evaluateRandomAction(state, actionProbabilities, values)
+            values[state] = evaluateRandomAction(state, actionProbabilities, values, rules)
             delta = max(delta, abs(values[state] - oldValue))
-        
+
+        if callback is not None:
+            callback(delta, len(rules.STATES), time.perf_counter() - sweepStart)
         if delta <= THETA:
             break
     
     return values
 
 
-def evaluateRandomAction(state, actionProbabilities, currentValues):
+def evaluateRandomAction(state, actionProbabilities, currentValues, rules=DEFAULT_RULES):
     # Return zero if the state is terminal
-    if state == StackJack.BUST:
+    if state == rules.BUST:
         return 0
 
     ## Evaluate the "Stand" action
@@ -35,16 +49,16 @@ def evaluateRandomAction(state, actionProbabilities, currentValues):
     # Start with zero expected reward,
     # then iterate over all cards in the stack and increment.
     expectedReward = 0 # Initialized as zero, incremented below
-    for dealerCard in StackJack.DEALER_STACK:
+    for dealerCard in rules.DEALER_STACK:
         # Probability of each card is 1/"number of cards"
-        pDealerCard = 1/len(StackJack.DEALER_STACK)
+        pDealerCard = 1/len(rules.DEALER_STACK)
 
         if state > dealerCard:
-            expectedReward += pDealerCard * StackJack.REWARD_WIN
+            expectedReward += pDealerCard * rules.REWARD_WIN
         elif state == dealerCard:
-            expectedReward += pDealerCard * StackJack.REWARD_DRAW
+            expectedReward += pDealerCard * rules.REWARD_DRAW
         else:
-            expectedReward += pDealerCard * StackJack.REWARD_LOST
+            expectedReward += pDealerCard * rules.REWARD_LOST
     
     newValueStand = expectedReward + GAMMA * expectedStateValue
 
@@ -54,16 +68,16 @@ def evaluateRandomAction(state, actionProbabilities, currentValues):
     # then iterate over all cards in the stack and increment.
     expectedStateValue = 0
     expectedReward = 0
-    for playerCard in StackJack.STACK1:
+    for playerCard in rules.STACK1:
         # Probability of each card is 1/"number of cards"
-        pPlayerCard = 1/len(StackJack.STACK1)
-        newState = min(state + playerCard, StackJack.BUST)
-        if newState == StackJack.BUST:
+        pPlayerCard = 1/len(rules.STACK1)
+        newState = min(state + playerCard, rules.BUST)
+        if newState == rules.BUST:
             expectedStateValue += pPlayerCard * 0
-            expectedReward += pPlayerCard * (StackJack.REWARD_BUST + StackJack.REWARD_CARD)
+            expectedReward += pPlayerCard * (rules.REWARD_BUST + rules.REWARD_CARD)
         else:
             expectedStateValue += pPlayerCard * currentValues[newState]
-            expectedReward += pPlayerCard * StackJack.REWARD_CARD
+            expectedReward += pPlayerCard * rules.REWARD_CARD
     newValueStack1 = expectedReward + GAMMA * expectedStateValue
 
 
@@ -72,16 +86,16 @@ def evaluateRandomAction(state, actionProbabilities, currentValues):
     # then iterate over all cards in the stack and increment.
     expectedStateValue = 0
     expectedReward = 0
-    for playerCard in StackJack.STACK2:
+    for playerCard in rules.STACK2:
         # Probability of each card is 1/"number of cards"
-        pPlayerCard = 1/len(StackJack.STACK2)
-        newState = min(state + playerCard, StackJack.BUST)
-        if newState == StackJack.BUST:
+        pPlayerCard = 1/len(rules.STACK2)
+        newState = min(state + playerCard, rules.BUST)
+        if newState == rules.BUST:
             expectedStateValue += pPlayerCard * 0
-            expectedReward += pPlayerCard * (StackJack.REWARD_BUST + StackJack.REWARD_CARD)
+            expectedReward += pPlayerCard * (rules.REWARD_BUST + rules.REWARD_CARD)
         else:
             expectedStateValue += pPlayerCard * currentValues[newState]
-            expectedReward += pPlayerCard * StackJack.REWARD_CARD
+            expectedReward += pPlayerCard * rules.REWARD_CARD
     newValueStack2 = expectedReward + GAMMA * expectedStateValue
 
     
@@ -97,11 +111,88 @@ def evaluateRandomAction(state, actionProbabilities, currentValues):
 
 
 
+@functools.lru_cache(maxsize=None)
+def buildModel(rules=DEFAULT_RULES):
+    # Build the model of the game as arrays (only once, the result is cached):
+    # `P[a, s, s2]` is the probability of moving from `s` to `s2` with action `a`,
+    # `R[s, a]` is the expected reward of action `a` in state `s`.
+    # The terminal state (BUST) has no outgoing transitions, so its value is always 0.
+    nStates = len(rules.STATES)
+    P = np.zeros((3, nStates, nStates))
+    R = np.zeros((nStates, 3))
+
+    for state in rules.STATES:
+        if state == rules.BUST:
+            continue
+
+        ## "Stand": the dealer draws a card, then the game is over
+        P[ACTION_STAND, state, rules.BUST] = 1
+        for dealerCard in rules.DEALER_STACK:
+            pDealerCard = 1/len(rules.DEALER_STACK)
+            if state > dealerCard:
+                R[state, ACTION_STAND] += pDealerCard * rules.REWARD_WIN
+            elif state == dealerCard:
+                R[state, ACTION_STAND] += pDealerCard * rules.REWARD_DRAW
+            else:
+                R[state, ACTION_STAND] += pDealerCard * rules.REWARD_LOST
+
+        ## "Stack 1"/"Stack 2": the player draws a card and might go bust
+        for action, stack in [(ACTION_STACK_1, rules.STACK1), (ACTION_STACK_2, rules.STACK2)]:
+            for playerCard in stack:
+                pPlayerCard = 1/len(stack)
+                newState = min(state + playerCard, rules.BUST)
+                P[action, state, newState] += pPlayerCard
+                R[state, action] += pPlayerCard * rules.REWARD_CARD
+                if newState == rules.BUST:
+                    R[state, action] += pPlayerCard * rules.REWARD_BUST
+
+    # The cached arrays are shared, so make sure they are not modified by accident
+    P.flags.writeable = False
+    R.flags.writeable = False
+    return P, R
+
+
+def evaluatePolicyExact(policy, rules=DEFAULT_RULES):
+    # Same result as `evaluatePolicy`, but computed directly by solving the linear system
+    # (I - GAMMA * P_policy) v = r_policy instead of iterating until convergence
+    P, R = buildModel(rules)
+    actionProbabilities = np.asarray(policy, dtype=float)
+    policyTransitions = np.einsum('sa,ast->st', actionProbabilities, P)
+    policyRewards = np.sum(actionProbabilities * R, axis=1)
+    return np.linalg.solve(np.eye(len(rules.STATES)) - GAMMA * policyTransitions, policyRewards)
+
+
+def evaluatePolicies(policies, rules=DEFAULT_RULES):
+    # Evaluate many policies at once: `policies` has shape (K, S, 3) (action probabilities per state),
+    # the result has shape (K, S). All K linear systems are solved in one (batched) call.
+    P, R = buildModel(rules)
+    actionProbabilities = np.asarray(policies, dtype=float)
+    policyTransitions = np.einsum('ksa,ast->kst', actionProbabilities, P)
+    policyRewards = np.sum(actionProbabilities * R, axis=2)
+    identity = np.eye(len(rules.STATES))
+    return np.linalg.solve(identity - GAMMA * policyTransitions, policyRewards[..., None])[..., 0]
+
+
+def computeActionValues(values, rules=DEFAULT_RULES):
+    # Expected reward + discounted value of the next state for every state and action.
+    # `values` has shape (S,) or (K, S), the result (S, 3) or (K, S, 3).
+    P, R = buildModel(rules)
+    return R + GAMMA * np.einsum('ast,...t->...sa', P, values)
+
+
+def chooseGreedyPolicies(values, rules=DEFAULT_RULES):
+    # Greedy (deterministic) policies for many value functions at once,
+    # `values` has shape (K, S), the result (K, S, 3) with one-hot action probabilities
+    actionValues = computeActionValues(values, rules)
+    bestActions = np.argmax(actionValues, axis=-1)
+    return np.eye(3)[bestActions]
+
+
 # Helper function to evaluate a single (deterministic action)
-def evaluateAction(state, action, values):
+def evaluateAction(state, action, values, rules=DEFAULT_RULES):
     actionProbabilites = [0, 0, 0]
     actionProbabilites[action] = 1
-    return evaluateRandomAction(state, actionProbabilites, values)
+    return evaluateRandomAction(state, actionProbabilites, values, rules)
 
 
 def deterministicToRandomPolicy(detPolicy):
@@ -117,11 +208,11 @@ def randomToDeterministicPolicy(randomPolicy):
     return detPolicy
 
 
-def chooseGreedyPolicy(values):
+def chooseGreedyPolicy(values, rules=DEFAULT_RULES):
     allActions = [ACTION_STAND, ACTION_STACK_1, ACTION_STACK_2]
     policy = []
-    for state in StackJack.STATES:
-        actionValues = [evaluateAction(state, action, values) for action in allActions]
+    for state in rules.STATES:
+        actionValues = [evaluateAction(state, action, values, rules) for action in allActions]
         
         bestActionIndex = np.argmax(actionValues)
         actionProbabilities = [0 for a in allActions]
@@ -132,5 +223,37 @@ def chooseGreedyPolicy(values):
     return policy
 
 
+def solveOptimal(rules=DEFAULT_RULES, cacheDir=None):
+    # Optimal values (array of length S) and policy (array of shape (S, 3)) for the given rules.
+    # Results are cached in memory and, if `cacheDir` is given, also on disk
+    # (one file per rules variant, so other processes/jobs can reuse them).
+    if cacheDir is None:
+        values, policy = _solveOptimalCached(rules)
+        return values.copy(), policy.copy()
+
+    path = os.path.join(cacheDir, 'stackjack_{}_gamma{}.npz'.format(rules.key(), GAMMA))
+    if os.path.exists(path):
+        with np.load(path) as data:
+            return data['values'], data['policy']
+
+    values, policy = _solveOptimalCached(rules)
+    # Write to a temporary file first, so other processes never see a half-written file
+    os.makedirs(cacheDir, exist_ok=True)
+    tmpPath = '{}.{}.tmp.npz'.format(path[:-4], os.getpid())
+    np.savez(tmpPath, values=values, policy=policy)
+    os.replace(tmpPath, path)
+    return values.copy(), policy.copy()
 
 
+@functools.lru_cache(maxsize=128)
+def _solveOptimalCached(rules):
+    # Policy iteration with exact policy evaluation, starting from "always stand"
+    policy = np.zeros((len(rules.STATES), 3))
+    policy[:, ACTION_STAND] = 1
+    while True:
+        values = evaluatePolicyExact(policy, rules)
+        newPolicy = chooseGreedyPolicies(values, rules)
+        if np.array_equal(newPolicy, policy):
+            break
+        policy = newPolicy
+    return values, policy
@@ -0,0 +1,52 @@
+import numpy as np
+import scipy.signal
+from typing import Optional
+
+
+def firstVisitMask(states: np.ndarray, actions: Optional[np.ndarray] = None, nActions: int = 3) -> np.ndarray:
+    """
+    Marks the steps of each episode where the state (or the state-action pair, if `actions` is given)
+    is visited for the first time. `states` has shape (T,) for one episode or (N, T) for many padded
+    episodes (padding is -1, as in `Trajectories`). This is a single forward pass over the steps,
+    remembering which keys each episode has already seen.
+    """
+    states = np.asarray(states)
+    keys = states if actions is None else states * nActions + np.asarray(actions)
+    valid = states >= 0
+    keys = np.where(valid, keys, 0)
+
+    episodes = np.atleast_2d(keys)
+    nEpisodes, nSteps = episodes.shape
+    nKeys = int(episodes.max(initial=0)) + 1
+    seen = np.zeros((nEpisodes, nKeys), dtype=bool)
+    mask = np.zeros(episodes.shape, dtype=bool)
+    rows = np.arange(nEpisodes)
+    for t in range(nSteps):
+        mask[:, t] = ~seen[rows, episodes[:, t]]
+        seen[rows, episodes[:, t]] = True
+    return mask.reshape(keys.shape) & valid
+
+
+def discountedReturns(rewards: np.ndarray, gamma: float) -> np.ndarray:
+    """
+    Returns G_t = R_{t+1} + gamma * G_{t+1} for every step, where `rewards[..., t]` is the reward
+    received after the action at step `t` (shape (T,) or (N, T), padded with zeros).
+    For reward lists that start with a dummy 0 (as in the notebooks), pass `rewards[1:]`.
+    """
+    rewards = np.asarray(rewards, dtype=float)
+    # The backward recursion is a linear filter applied to the reversed rewards
+    return scipy.signal.lfilter([1], [1, -gamma], rewards[..., ::-1], axis=-1)[..., ::-1]
+
+
+def firstVisitReturns(
+        states: np.ndarray,
+        rewards: np.ndarray,
+        gamma: float,
+        actions: Optional[np.ndarray] = None,
+        nActions: int = 3,
+    ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    First-visit mask (see `firstVisitMask`) and discounted returns (see `discountedReturns`) of episodes,
+    e.g. `acc.addBatch(states[mask], returns[mask])`.
+    """
+    return firstVisitMask(states, actions, nActions), discountedReturns(rewards, gamma)
@@ -0,0 +1,95 @@
+import numpy as np
+import scipy.linalg
+import scipy.sparse
+from typing import Union
+
+
+class RandomWalk:
+    """
+    The random walk from `randomWalk_solution.ipynb` (Example 6.2 in Sutton & Barto), generalized:
+    each step goes right with probability `pRight` (else left), the outermost states `0` and `length-1`
+    are terminal, and entering them gives the reward `leftReward`/`rightReward` (every other step gives 0).
+    """
+    def __init__(
+            self,
+            length: int,
+            pRight: float = 0.5,
+            leftReward: float = 0,
+            rightReward: float = 1,
+            rng: Union[np.random.Generator, int, None] = None,
+        ):
+        self.length = length
+        self.pRight = pRight
+        self.leftReward = leftReward
+        self.rightReward = rightReward
+        self.rng = np.random.default_rng(rng)
+        self.pos = self.length // 2
+
+    def isTerminal(self, pos: int) -> bool:
+        return pos == 0 or pos == self.length - 1
+
+    def step(self) -> tuple[int, float]:
+        if self.isTerminal(self.pos):
+            return self.pos, 0
+        if self.rng.uniform() < self.pRight:
+            self.pos += 1
+        else:
+            self.pos -= 1
+        reward = 0
+        if self.pos == self.length - 1:
+            reward = self.rightReward
+        elif self.pos == 0:
+            reward = self.leftReward
+        return self.pos, reward
+
+    def reset(self) -> int:
+        self.pos = self.length // 2
+        return self.pos
+
+    def transitionMatrix(self) -> scipy.sparse.csr_matrix:
+        """
+        Sparse (tridiagonal) matrix `P[s, s2]` with the probability of moving from `s` to `s2`.
+        The rows of the terminal states are zero.
+        """
+        interior = np.arange(1, self.length - 1)
+        rows = np.concatenate([interior, interior])
+        cols = np.concatenate([interior + 1, interior - 1])
+        probs = np.concatenate([
+            np.full(len(interior), self.pRight),
+            np.full(len(interior), 1 - self.pRight),
+        ])
+        return scipy.sparse.csr_matrix((probs, (rows, cols)), shape=(self.length, self.length))
+
+    def rewardVector(self) -> np.ndarray:
+        """
+        Expected reward `r[s]` of the next step from each state (0 in the terminal states).
+        """
+        rewards = np.zeros(self.length)
+        if self.length > 2:
+            rewards[self.length - 2] += self.pRight * self.rightReward
+            rewards[1] += (1 - self.pRight) * self.leftReward
+        return rewards
+
+    def model(self) -> tuple[scipy.sparse.csr_matrix, np.ndarray]:
+        """
+        The transition matrix and the reward vector, see `transitionMatrix` and `rewardVector`.
+        """
+        return self.transitionMatrix(), self.rewardVector()
+
+    def trueValues(self, gamma: float = 1) -> np.ndarray:
+        """
+        Exact values of all states (0 in the terminal states), from solving (I - gamma * P) v = r
+        for the interior states with a banded (tridiagonal) solver, which is linear in `length`.
+        """
+        values = np.zeros(self.length)
+        nInterior = self.length - 2
+        if nInterior <= 0:
+            return values
+
+        # Rows of the diagonal storage: upper diagonal (moving right), diagonal, lower diagonal (moving left)
+        banded = np.zeros((3, nInterior))
+        banded[0, 1:] = -gamma * self.pRight
+        banded[1, :] = 1
+        banded[2, :-1] = -gamma * (1 - self.pRight)
+        values[1:-1] = scipy.linalg.solve_banded((1, 1), banded, self.rewardVector()[1:-1])
+        return values
@@ -0,0 +1,94 @@
+import numpy as np
+from typing import Union
+
+from episodes import firstVisitReturns
+from randomWalk import RandomWalk
+
+# Learning methods compared in `randomWalk_solution.ipynb`
+TD = 'td'
+MONTE_CARLO = 'monteCarlo'
+
+
+def computeRMSs(values: np.ndarray, trueValues: np.ndarray) -> np.ndarray:
+    """
+    Root mean square error over the non-terminal states, `values` has shape (..., LENGTH).
+    """
+    errors = values[..., 1:-1] - trueValues[1:-1]
+    return np.sqrt(np.mean(np.square(errors), axis=-1))
+
+
+def runExperiments(
+        method: str,
+        walk: RandomWalk,
+        alphas,
+        nRuns: int,
+        nEpisodes: int,
+        rng: Union[np.random.Generator, int, None] = None,
+        gamma: float = 1,
+        initialValue: float = 0.5,
+    ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Learn the values of `walk` with TD(0) (`method=TD`) or constant-alpha first-visit Monte Carlo
+    (`method=MONTE_CARLO`) in `nRuns` independent runs for each of the step sizes `alphas`.
+    All R * K walks are simulated in lock-step, each with its own value function (finished walks wait
+    for the others until the episode is over). Non-terminal values start at `initialValue`, as in the notebook.
+    Returns the RMS error after each episode, shape (R, K, nEpisodes), and the final values, shape (R, K, LENGTH).
+    """
+    if method not in (TD, MONTE_CARLO):
+        raise ValueError('Unknown method: {}'.format(method))
+    rng = np.random.default_rng(rng)
+    alphas = np.asarray(alphas, dtype=float)
+    nAlphas = len(alphas)
+    nWalks = nRuns * nAlphas
+    length = walk.length
+    trueValues = walk.trueValues(gamma)
+
+    # One row per walk (run-major, i.e. walk `i` is run `i // K` with alpha `i % K`)
+    walkAlphas = np.tile(alphas, nRuns)
+    values = np.full((nWalks, length), initialValue, dtype=float)
+    values[:, [0, -1]] = 0
+    rms = np.zeros((nWalks, nEpisodes))
+
+    for episode in range(nEpisodes):
+        positions = np.full(nWalks, length // 2)
+        running = np.arange(nWalks)
+        if walk.isTerminal(length // 2):
+            running = running[:0]
+        # For Monte Carlo: the states and rewards of all steps, padded with -1/0 for finished walks
+        stepStates = []
+        stepRewards = []
+        while len(running) > 0:
+            oldPositions = positions[running]
+            newPositions = oldPositions + np.where(rng.random(len(running)) < walk.pRight, 1, -1)
+            rewards = np.where(
+                newPositions == length - 1,
+                walk.rightReward,
+                np.where(newPositions == 0, walk.leftReward, 0),
+            )
+            positions[running] = newPositions
+
+            if method == TD:
+                target = rewards + gamma * values[running, newPositions]
+                values[running, oldPositions] += walkAlphas[running] * (target - values[running, oldPositions])
+            else:
+                states = np.full(nWalks, -1)
+                states[running] = oldPositions
+                stepStates.append(states)
+                allRewards = np.zeros(nWalks)
+                allRewards[running] = rewards
+                stepRewards.append(allRewards)
+
+            running = running[(newPositions != 0) & (newPositions != length - 1)]
+
+        if method == MONTE_CARLO and stepStates:
+            states = np.stack(stepStates, axis=1)
+            firstVisits, returns = firstVisitReturns(states, np.stack(stepRewards, axis=1), gamma)
+            walkIndices = np.nonzero(firstVisits)[0]
+            visitedStates = states[firstVisits]
+            values[walkIndices, visitedStates] += walkAlphas[walkIndices] * (
+                returns[firstVisits] - values[walkIndices, visitedStates]
+            )
+
+        rms[:, episode] = computeRMSs(values, trueValues)
+
+    return rms.reshape(nRuns, nAlphas, nEpisodes), values.reshape(nRuns, nAlphas, length)
@@ -0,0 +1,130 @@
+import os
+import numpy as np
+from statistics import NormalDist
+from typing import Union
+
+Index = Union[int, tuple[int, ...]]
+
+
+class ReturnsAccumulator:
+    """
+    Running mean and variance (Welford's algorithm) of the returns observed for each state
+    (or state-action pair, or any other index), stored in preallocated arrays of shape `shape`.
+    Uses constant memory, no matter how many returns are added.
+    Accumulators of independent runs can be merged, and saved to/loaded from `.npz` checkpoints.
+    """
+    def __init__(self, shape: Union[int, tuple[int, ...]]):
+        self.counts = np.zeros(shape, dtype=np.int64)
+        self.means = np.zeros(shape)
+        # Sum of squared differences from the mean (variance * (count - 1))
+        self.m2 = np.zeros(shape)
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        return self.counts.shape
+
+    @property
+    def total(self) -> int:
+        # Total number of returns added so far
+        return int(self.counts.sum())
+
+    def add(self, index: Index, value: float):
+        """
+        Add a single return, e.g. `acc.add(state, G)` or `acc.add((state, action), G)`.
+        """
+        self.counts[index] += 1
+        delta = value - self.means[index]
+        self.means[index] += delta / self.counts[index]
+        self.m2[index] += delta * (value - self.means[index])
+
+    def addBatch(self, indices, values: np.ndarray):
+        """
+        Add many returns at once: `values[i]` is added at index `indices[i]`
+        (an array of flat indices, or a tuple of index arrays like `(states, actions)`).
+        """
+        if isinstance(indices, tuple):
+            indices = np.ravel_multi_index(indices, self.shape)
+        indices = np.asarray(indices).ravel()
+        values = np.asarray(values, dtype=float).ravel()
+        size = self.counts.size
+
+        # Statistics of the batch, then combine them with the current ones
+        counts = np.bincount(indices, minlength=size)
+        sums = np.bincount(indices, weights=values, minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, sums / counts, 0)
+        m2 = np.bincount(indices, weights=(values - means[indices])**2, minlength=size)
+        self._combine(counts.reshape(self.shape), means.reshape(self.shape), m2.reshape(self.shape))
+
+    def merge(self, other: 'ReturnsAccumulator') -> 'ReturnsAccumulator':
+        """
+        Add the returns of `other` (with the same shape) to this accumulator, returns `self`.
+        """
+        if other.shape != self.shape:
+            raise ValueError('Can only merge accumulators of the same shape')
+        self._combine(other.counts, other.means, other.m2)
+        return self
+
+    def _combine(self, counts, means, m2):
+        # Combine two sets of statistics (Chan et al.), this is exact up to rounding
+        total = self.counts + counts
+        delta = means - self.means
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(total > 0, counts / total, 0)
+        self.means += delta * weight
+        self.m2 += m2 + delta**2 * self.counts * weight
+        self.counts = total
+
+    @property
+    def variances(self) -> np.ndarray:
+        """
+        Sample variance of the returns (NaN where less than two returns were added).
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.counts > 1, self.m2 / (self.counts - 1), np.nan)
+
+    @property
+    def standardErrors(self) -> np.ndarray:
+        """
+        Standard error of the means.
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self.variances / self.counts)
+
+    def confidenceIntervals(self, level: float = 0.95) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Lower and upper bounds of the (normal approximation) confidence intervals of the means.
+        """
+        z = NormalDist().inv_cdf(0.5 + level / 2)
+        halfWidths = z * self.standardErrors
+        return self.means - halfWidths, self.means + halfWidths
+
+    def save(self, file):
+        """
+        Save a checkpoint to a `.npz` file. If `file` is a path, the file is replaced atomically,
+        so an interrupted run never leaves a broken checkpoint behind.
+        """
+        data = self._checkpointData()
+        if not isinstance(file, (str, os.PathLike)):
+            np.savez(file, **data)
+            return
+        path = os.fspath(file)
+        tmpPath = '{}.{}.tmp.npz'.format(path[:-4] if path.endswith('.npz') else path, os.getpid())
+        np.savez(tmpPath, **data)
+        os.replace(tmpPath, path)
+
+    def _checkpointData(self) -> dict[str, np.ndarray]:
+        # Arrays written by `save` (subclasses can add their own)
+        return dict(counts=self.counts, means=self.means, m2=self.m2)
+
+    @staticmethod
+    def load(file) -> 'ReturnsAccumulator':
+        """
+        Load a checkpoint that was written with `save`.
+        """
+        with np.load(file) as data:
+            acc = ReturnsAccumulator(data['counts'].shape)
+            acc.counts[...] = data['counts']
+            acc.means[...] = data['means']
+            acc.m2[...] = data['m2']
+        return acc
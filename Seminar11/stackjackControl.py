@@ -0,0 +1,110 @@
+import numpy as np
+from typing import NamedTuple, Optional, Union
+
+from episodes import firstVisitReturns
+from stackjackClass import StackJackRules
+from stackjackSimulator import simulateGames, GAMMA
+
+N_ACTIONS = 3
+
+# Variants of Monte Carlo control
+EXPLORING_STARTS = 'exploringStarts'
+EPSILON_GREEDY = 'epsilonGreedy'
+OFF_POLICY = 'offPolicy'
+
+
+class ControlResult(NamedTuple):
+    """
+    Result of `monteCarloControl`: action values `qValues[s, a]`, the greedy policy and the policy
+    that was followed in the last batch (action probabilities, shape (S, 3)), and the number of returns
+    (or, for off-policy control, the cumulative importance sampling weights) behind each action value.
+    """
+    qValues: np.ndarray
+    policy: np.ndarray
+    behaviourPolicy: np.ndarray
+    weights: np.ndarray
+
+
+def greedyPolicy(qValues: np.ndarray) -> np.ndarray:
+    # Deterministic policy (one-hot action probabilities) choosing the best action in each state
+    return np.eye(qValues.shape[1])[np.argmax(qValues, axis=1)]
+
+
+def epsilonGreedyPolicy(qValues: np.ndarray, epsilon: float) -> np.ndarray:
+    # Choose a random action with probability epsilon, else the best action
+    nActions = qValues.shape[1]
+    return epsilon / nActions + (1 - epsilon) * greedyPolicy(qValues)
+
+
+def monteCarloControl(
+        nEpisodes: int,
+        method: str = EPSILON_GREEDY,
+        epsilon: float = 0.1,
+        batchSize: int = 10_000,
+        rng: Union[np.random.Generator, int, None] = None,
+        rules: StackJackRules = StackJackRules(),
+        gamma: float = GAMMA,
+        qValues: Optional[np.ndarray] = None,
+    ) -> ControlResult:
+    """
+    First-visit Monte Carlo control with batches of `batchSize` episodes from the vectorized simulator.
+    After each batch the action values are updated with scatter-adds and the policy is improved.
+    `method` is one of
+    - `EXPLORING_STARTS`: random start state and first action, then follow the greedy policy
+    - `EPSILON_GREEDY`: on-policy, follow (and learn) the epsilon-greedy policy
+    - `OFF_POLICY`: follow the epsilon-greedy policy, learn the greedy policy with weighted importance sampling
+    `qValues` can be used to continue from earlier results (note that the weights start from zero again).
+    """
+    if method not in (EXPLORING_STARTS, EPSILON_GREEDY, OFF_POLICY):
+        raise ValueError('Unknown method: {}'.format(method))
+    rng = np.random.default_rng(rng)
+    nStates = len(rules.STATES)
+    qValues = np.zeros((nStates, N_ACTIONS)) if qValues is None else np.array(qValues, dtype=float)
+    weights = np.zeros((nStates, N_ACTIONS))
+
+    for start in range(0, nEpisodes, batchSize):
+        n = min(batchSize, nEpisodes - start)
+        target = greedyPolicy(qValues)
+        if method == EXPLORING_STARTS:
+            behaviour = target
+            s0 = rng.integers(rules.BUST, size=n)
+            a0 = rng.integers(N_ACTIONS, size=n)
+        else:
+            behaviour = epsilonGreedyPolicy(qValues, epsilon)
+            s0 = 0
+            a0 = None
+
+        _, trajectories = simulateGames(
+            behaviour, n, rng, s0, rules, gamma, returnTrajectories=True, a0=a0
+        )
+        states = trajectories.states.astype(np.int64)
+        actions = trajectories.actions.astype(np.int64)
+        firstVisits, returns = firstVisitReturns(states, trajectories.rewards, gamma, actions, N_ACTIONS)
+
+        if method == OFF_POLICY:
+            # Importance sampling ratio of each step (target / behaviour probability, 1 for padding),
+            # the weight of a return is the product of the ratios of all later steps in the episode
+            valid = states >= 0
+            ratios = np.ones(states.shape)
+            ratios[valid] = target[states[valid], actions[valid]] / behaviour[states[valid], actions[valid]]
+            laterRatios = np.cumprod(ratios[:, ::-1], axis=1)[:, ::-1]
+            stepWeights = np.concatenate([laterRatios[:, 1:], np.ones((n, 1))], axis=1)
+            firstVisits &= stepWeights > 0
+            stepWeights = stepWeights[firstVisits]
+        else:
+            stepWeights = np.ones(np.count_nonzero(firstVisits))
+
+        # Weighted averages of all returns so far, updated with the sums over the batch
+        keys = states[firstVisits] * N_ACTIONS + actions[firstVisits]
+        size = nStates * N_ACTIONS
+        batchWeights = np.bincount(keys, weights=stepWeights, minlength=size).reshape(nStates, N_ACTIONS)
+        batchSums = np.bincount(
+            keys, weights=stepWeights * returns[firstVisits], minlength=size
+        ).reshape(nStates, N_ACTIONS)
+        weights += batchWeights
+        with np.errstate(invalid='ignore', divide='ignore'):
+            qValues += np.where(weights > 0, (batchSums - batchWeights * qValues) / weights, 0)
+
+    target = greedyPolicy(qValues)
+    behaviour = target if method == EXPLORING_STARTS else epsilonGreedyPolicy(qValues, epsilon)
+    return ControlResult(qValues, target, behaviour, weights)
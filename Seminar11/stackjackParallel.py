@@ -0,0 +1,149 @@
+import math
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Union
+
+from episodes import firstVisitReturns
+from returnsAccumulator import ReturnsAccumulator
+from stackjackClass import StackJackRules, spawnSeeds
+from stackjackSimulator import simulateGames, Trajectories, GAMMA
+
+
+class MonteCarloStats(ReturnsAccumulator):
+    """
+    Statistics of the returns observed in each state: the running mean and variance of a `ReturnsAccumulator`,
+    plus a histogram of the returns. Statistics of independent runs can be merged.
+    """
+    def __init__(self, nStates: int, bins: np.ndarray):
+        super().__init__(nStates)
+        self.bins = np.asarray(bins, dtype=float)
+        self.histograms = np.zeros((nStates, len(self.bins) - 1), dtype=np.int64)
+
+    @property
+    def nStates(self) -> int:
+        return len(self.counts)
+
+    @property
+    def values(self) -> np.ndarray:
+        """
+        Mean return of each state (NaN for states that were never visited).
+        """
+        return np.where(self.counts > 0, self.means, np.nan)
+
+    def addReturns(self, states: np.ndarray, returns: np.ndarray):
+        """
+        Add the returns `returns[i]` observed in the states `states[i]`.
+        """
+        states = np.asarray(states, dtype=np.int64)
+        returns = np.asarray(returns, dtype=float)
+        self.addBatch(states, returns)
+
+        # Returns outside of the bins are counted in the first/last bin
+        nBins = self.histograms.shape[1]
+        binIndices = np.clip(np.searchsorted(self.bins, returns, side='right') - 1, 0, nBins - 1)
+        self.histograms += np.bincount(
+            states * nBins + binIndices, minlength=self.histograms.size
+        ).reshape(self.histograms.shape)
+
+    def addTrajectories(self, trajectories: Trajectories, gamma: float = GAMMA):
+        """
+        Add the returns following the first visit of each state in the given trajectories.
+        """
+        firstVisits, returns = firstVisitReturns(trajectories.states, trajectories.rewards, gamma)
+        self.addReturns(trajectories.states[firstVisits], returns[firstVisits])
+
+    def merge(self, other: 'MonteCarloStats') -> 'MonteCarloStats':
+        """
+        Add the statistics of `other` (with the same states and bins) to this object, returns `self`.
+        """
+        if other.nStates != self.nStates or not np.array_equal(other.bins, self.bins):
+            raise ValueError('Can only merge statistics with the same states and bins')
+        super().merge(other)
+        self.histograms += other.histograms
+        return self
+
+    def _checkpointData(self) -> dict[str, np.ndarray]:
+        return dict(super()._checkpointData(), bins=self.bins, histograms=self.histograms)
+
+    @staticmethod
+    def load(file) -> 'MonteCarloStats':
+        """
+        Load a checkpoint that was written with `save`.
+        """
+        with np.load(file) as data:
+            stats = MonteCarloStats(len(data['counts']), data['bins'])
+            stats.counts[...] = data['counts']
+            stats.means[...] = data['means']
+            stats.m2[...] = data['m2']
+            stats.histograms[...] = data['histograms']
+        return stats
+
+
+def defaultBins(rules: StackJackRules = StackJackRules()) -> np.ndarray:
+    # One bin per integer between the lowest and highest possible (undiscounted) return
+    worst = rules.BUST * min(rules.REWARD_CARD, 0) + min(
+        rules.REWARD_LOST, rules.REWARD_DRAW, rules.REWARD_BUST + rules.REWARD_CARD, 0
+    )
+    best = rules.BUST * max(rules.REWARD_CARD, 0) + max(
+        rules.REWARD_WIN, rules.REWARD_DRAW, rules.REWARD_BUST + rules.REWARD_CARD, 0
+    )
+    return np.arange(math.floor(worst) - 0.5, math.ceil(best) + 1.5)
+
+
+def _runShard(policy, n, seed, s0, rules, gamma, bins, chunkSize):
+    # Simulate the games of one shard with its own generator, only the statistics are sent back
+    rng = np.random.default_rng(seed)
+    stats = MonteCarloStats(len(rules.STATES), bins)
+    for start in range(0, n, chunkSize):
+        m = min(chunkSize, n - start)
+        shardS0 = s0 if np.ndim(s0) == 0 else s0[start:start + m]
+        _, trajectories = simulateGames(policy, m, rng, shardS0, rules, gamma, returnTrajectories=True)
+        stats.addTrajectories(trajectories, gamma)
+    return stats
+
+
+def parallelMonteCarlo(
+        policy,
+        n: int,
+        seed: Union[np.random.SeedSequence, int, None] = None,
+        s0: Union[int, np.ndarray] = 0,
+        rules: StackJackRules = StackJackRules(),
+        gamma: float = GAMMA,
+        nWorkers: Optional[int] = None,
+        shardSize: int = 100_000,
+        bins: Optional[np.ndarray] = None,
+        chunkSize: int = 100_000,
+    ) -> MonteCarloStats:
+    """
+    Monte Carlo evaluation of `policy` (action probabilities per state) with `n` games,
+    split into shards of `shardSize` games that are simulated by `nWorkers` processes (default: all cores).
+    Each shard gets its own generator spawned from `seed`, so the result only depends on `seed` and `shardSize`
+    (not on the number of workers). `s0` is the start state (or one start state per game).
+    Returns the merged statistics, e.g. `stats.values` and `stats.histograms[s0]` (with `stats.bins`).
+    """
+    if bins is None:
+        bins = defaultBins(rules)
+    s0 = np.asarray(s0)
+    policy = np.asarray(policy, dtype=float)
+
+    nShards = max(1, math.ceil(n / shardSize))
+    seeds = spawnSeeds(seed, nShards)
+    shards = [
+        (start, min(start + shardSize, n)) for start in range(0, nShards * shardSize, shardSize)
+    ]
+    arguments = [
+        (policy, stop - start, shardSeed, s0 if s0.ndim == 0 else s0[start:stop], rules, gamma, bins, chunkSize)
+        for (start, stop), shardSeed in zip(shards, seeds)
+    ]
+
+    stats = MonteCarloStats(len(rules.STATES), bins)
+    if nWorkers == 1:
+        for args in arguments:
+            stats.merge(_runShard(*args))
+        return stats
+
+    # Merge the results in shard order, so the result is exactly reproducible
+    with ProcessPoolExecutor(max_workers=nWorkers) as executor:
+        for shardStats in executor.map(_runShard, *zip(*arguments)):
+            stats.merge(shardStats)
+    return stats
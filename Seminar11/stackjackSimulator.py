@@ -0,0 +1,144 @@
+import numpy as np
+from typing import NamedTuple, Union
+
+from stackjackClass import StackJackRules, ACTION_STAND, ACTION_STACK_1, ACTION_STACK_2
+
+GAMMA = 1
+
+
+class Trajectories(NamedTuple):
+    """
+    Packed trajectories of many games, padded to the length of the longest game.
+    `states[i, t]`, `actions[i, t]` are the state and action at step `t` of game `i` (-1 after the game ended),
+    `rewards[i, t]` is the reward received for that action (0 after the game ended).
+    """
+    states: np.ndarray
+    actions: np.ndarray
+    rewards: np.ndarray
+    lengths: np.ndarray
+
+
+def simulateGames(
+        policy,
+        n: int,
+        rng: Union[np.random.Generator, int, None] = None,
+        s0: Union[int, np.ndarray] = 0,
+        rules: StackJackRules = StackJackRules(),
+        gamma: float = GAMMA,
+        returnTrajectories: bool = False,
+        chunkSize: int = 1_000_000,
+        a0: Union[int, np.ndarray, None] = None,
+    ) -> Union[np.ndarray, tuple[np.ndarray, Trajectories]]:
+    """
+    Play `n` games of StackJack in lock-step, following `policy` (action probabilities per state, shape (S, 3)).
+    `rng` can be a `numpy.random.Generator` or a seed, `s0` the start state (or one start state per game).
+    `a0` optionally fixes the first action (or the first action per game, -1 to follow the policy),
+    e.g. for exploring starts.
+    Returns the (discounted) return of each game, and the packed trajectories if `returnTrajectories` is True.
+    Games are simulated in chunks of `chunkSize` to limit memory usage.
+    """
+    rng = np.random.default_rng(rng)
+    s0 = np.broadcast_to(np.asarray(s0), (n,))
+    a0 = np.broadcast_to(np.asarray(-1 if a0 is None else a0), (n,))
+
+    # Cumulative action probabilities per state, used to sample actions with a single comparison
+    cumProbs = np.cumsum(np.asarray(policy, dtype=float), axis=1)
+
+    returns = np.zeros(n)
+    chunks = []
+    for start in range(0, n, chunkSize):
+        stop = min(start + chunkSize, n)
+        returns[start:stop], trajectories = _simulateChunk(
+            cumProbs, s0[start:stop], a0[start:stop], rng, rules, gamma, returnTrajectories
+        )
+        chunks.append(trajectories)
+
+    if not returnTrajectories:
+        return returns
+    return returns, _concatenateTrajectories(chunks)
+
+
+def _simulateChunk(cumProbs, s0, a0, rng, rules, gamma, returnTrajectories):
+    n = len(s0)
+    states = np.array(s0, dtype=np.int64)
+    returns = np.zeros(n)
+    discount = np.ones(n)
+    stack1 = np.array(rules.STACK1)
+    stack2 = np.array(rules.STACK2)
+    dealerStack = np.array(rules.DEALER_STACK)
+
+    # Indices of the games that are still running, and (optionally) a record of each step
+    running = np.flatnonzero(states != rules.BUST)
+    steps = []
+    firstStep = True
+    while len(running) > 0:
+        currentStates = states[running]
+
+        # Sample actions: the first action whose cumulative probability exceeds a uniform random number
+        u = rng.random(len(running))
+        actions = np.sum(u[:, None] >= cumProbs[currentStates], axis=1)
+        actions = np.minimum(actions, ACTION_STACK_2)
+        if firstStep:
+            # Use the given first actions instead (if any)
+            fixed = a0[running] >= 0
+            actions[fixed] = a0[running][fixed]
+            firstStep = False
+
+        rewards = np.zeros(len(running))
+        newStates = np.full(len(running), rules.BUST)
+
+        # "Stand": compare with a dealer card, the game is over in any case
+        stand = actions == ACTION_STAND
+        dealerCards = dealerStack[rng.integers(len(dealerStack), size=np.count_nonzero(stand))]
+        standStates = currentStates[stand]
+        rewards[stand] = np.where(
+            standStates > dealerCards,
+            rules.REWARD_WIN,
+            np.where(standStates == dealerCards, rules.REWARD_DRAW, rules.REWARD_LOST),
+        )
+
+        # "Stack 1"/"Stack 2": draw a card, check if we went bust
+        for action, stack in [(ACTION_STACK_1, stack1), (ACTION_STACK_2, stack2)]:
+            draw = actions == action
+            cards = stack[rng.integers(len(stack), size=np.count_nonzero(draw))]
+            drawStates = currentStates[draw] + cards
+            bust = drawStates >= rules.BUST
+            newStates[draw] = np.where(bust, rules.BUST, drawStates)
+            rewards[draw] = rules.REWARD_CARD + np.where(bust, rules.REWARD_BUST, 0)
+
+        returns[running] += discount[running] * rewards
+        discount[running] *= gamma
+        states[running] = newStates
+        if returnTrajectories:
+            steps.append((running, currentStates, actions, rewards))
+        running = running[newStates != rules.BUST]
+
+    if not returnTrajectories:
+        return returns, None
+
+    # Pack the recorded steps into padded (n, T) arrays
+    trajectories = Trajectories(
+        states=np.full((n, len(steps)), -1, dtype=np.int16),
+        actions=np.full((n, len(steps)), -1, dtype=np.int8),
+        rewards=np.zeros((n, len(steps))),
+        lengths=np.zeros(n, dtype=np.int64),
+    )
+    for t, (indices, stepStates, stepActions, stepRewards) in enumerate(steps):
+        trajectories.states[indices, t] = stepStates
+        trajectories.actions[indices, t] = stepActions
+        trajectories.rewards[indices, t] = stepRewards
+        trajectories.lengths[indices] += 1
+    return returns, trajectories
+
+
+def _concatenateTrajectories(chunks: list[Trajectories]) -> Trajectories:
+    # Pad all chunks to the same length before concatenating them
+    maxLength = max(chunk.states.shape[1] for chunk in chunks)
+    def pad(array, value):
+        return np.pad(array, ((0, 0), (0, maxLength - array.shape[1])), constant_values=value)
+    return Trajectories(
+        states=np.concatenate([pad(chunk.states, -1) for chunk in chunks]),
+        actions=np.concatenate([pad(chunk.actions, -1) for chunk in chunks]),
+        rewards=np.concatenate([pad(chunk.rewards, 0) for chunk in chunks]),
+        lengths=np.concatenate([chunk.lengths for chunk in chunks]),
+    )